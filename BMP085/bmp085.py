@@ -2,12 +2,17 @@
 
 # Python Standard Library Imports
 import time
+import asyncio
+import threading
 
 # External Imports
 pass
 
 # Custom Imports
-from pycomms import PyComms
+from pycomms import PyComms, PRIORITY_LOW
+from asyncpycomms import getAsync
+from busscan import registerDriver
+from resultcache import ResultCache, cachedResult
 
 # ===========================================================================
 # Adafruit BMP085 Class (slightly modified)
@@ -34,11 +39,18 @@ class BMP085:
     __BMP085_CAL_MB            = 0xBA  # R   Calibration data (16 bits)
     __BMP085_CAL_MC            = 0xBC  # R   Calibration data (16 bits)
     __BMP085_CAL_MD            = 0xBE  # R   Calibration data (16 bits)
+    __BMP085_CHIPID            = 0xD0
     __BMP085_CONTROL           = 0xF4
     __BMP085_TEMPDATA          = 0xF6
     __BMP085_PRESSUREDATA      = 0xF6
     __BMP085_READTEMPCMD       = 0x2E
     __BMP085_READPRESSURECMD   = 0x34
+    __BMP085_CHIPID_VALUE      = 0x55
+
+    # AC1-AC3 INT16, AC4-AC6 UINT16, B1, B2, MB, MC, MD INT16
+    __BMP085_CAL_FORMAT        = '>hhhHHHhhhhh'
+    # MSB, LSB, XLSB of a pressure reading
+    __BMP085_PRESSURE_FORMAT   = '>BBB'
 
     # Private Fields
     _cal_AC1 = 0
@@ -53,9 +65,17 @@ class BMP085:
     _cal_MC = 0
     _cal_MD = 0
 
-    def __init__(self, address = 0x77, mode = 3):
-        self.i2c = PyComms(address)
+    def __init__(self, address = 0x77, mode = 3, bus = None, cacheResults = False):
+        # slow polls, other devices on the bus go first
+        self.i2c = PyComms(address, bus, priority = PRIORITY_LOW)
         self.address = address
+        
+        # guards command -> conversion wait -> result sequences of the
+        # blocking, scheduler and asyncio reads alike, the bus itself is free
+        # for other devices during the wait. Across processes sharing a
+        # busbroker.BusBroker the sequence also holds the device
+        # (i2c.deviceSequence), other clients only wait to reach the BMP085.
+        self.conversionLock = threading.Lock()
 
         # Make sure the specified mode is in the appropriate range
         if ((mode < 0) | (mode > 3)):
@@ -63,96 +83,106 @@ class BMP085:
         else:
             self.mode = mode
             
+        # with cacheResults readTemperature / readPressure (and with it
+        # readAltitude) results are reused for one conversion time,
+        # results.age('readPressure') tells how old the last one is. Off by
+        # default, every call runs the conversions.
+        self.cacheResults = cacheResults
+        self.results = ResultCache()
+        self.updateResultTTLs()
+
         # Read the calibration data
         self.readCalibrationData()
 
+    @classmethod
+    def detect(cls, i2c):
+        # busscan check, the chip id register reads 0x55
+        return i2c.readU8(cls.__BMP085_CHIPID) == cls.__BMP085_CHIPID_VALUE
+
     def readCalibrationData(self):
-        # Reads the calibration data from the IC
-        self._cal_AC1 = self.i2c.readS16(self.__BMP085_CAL_AC1)   # INT16
-        self._cal_AC2 = self.i2c.readS16(self.__BMP085_CAL_AC2)   # INT16
-        self._cal_AC3 = self.i2c.readS16(self.__BMP085_CAL_AC3)   # INT16
-        self._cal_AC4 = self.i2c.readU16(self.__BMP085_CAL_AC4)   # UINT16
-        self._cal_AC5 = self.i2c.readU16(self.__BMP085_CAL_AC5)   # UINT16
-        self._cal_AC6 = self.i2c.readU16(self.__BMP085_CAL_AC6)   # UINT16
-        self._cal_B1 = self.i2c.readS16(self.__BMP085_CAL_B1)     # INT16
-        self._cal_B2 = self.i2c.readS16(self.__BMP085_CAL_B2)     # INT16
-        self._cal_MB = self.i2c.readS16(self.__BMP085_CAL_MB)     # INT16
-        self._cal_MC = self.i2c.readS16(self.__BMP085_CAL_MC)     # INT16
-        self._cal_MD = self.i2c.readS16(self.__BMP085_CAL_MD)     # INT16
+        # Reads the calibration data from the IC, AC1 .. MD in one transfer
+        (self._cal_AC1, self._cal_AC2, self._cal_AC3,
+         self._cal_AC4, self._cal_AC5, self._cal_AC6,
+         self._cal_B1, self._cal_B2,
+         self._cal_MB, self._cal_MC, self._cal_MD) = self.i2c.readStruct(self.__BMP085_CAL_AC1, self.__BMP085_CAL_FORMAT)
+
+    # Conversion steps shared by the blocking, scheduler and asyncio reads,
+    # start -> wait the conversion delay -> read, with conversionLock and
+    # the device held
+
+    def startTempConversion(self):
+        self.i2c.write8(self.__BMP085_CONTROL, self.__BMP085_READTEMPCMD)
+
+    def readTempResult(self):
+        return self.i2c.readU16(self.__BMP085_TEMPDATA)
+
+    def startPressureConversion(self):
+        self.i2c.write8(self.__BMP085_CONTROL, self.__BMP085_READPRESSURECMD + (self.mode << 6))
+
+    def readPressureResult(self):
+        msb, lsb, xlsb = self.i2c.readStruct(self.__BMP085_PRESSUREDATA, self.__BMP085_PRESSURE_FORMAT)
+        return ((msb << 16) + (lsb << 8) + xlsb) >> (8 - self.mode)
 
     def readRawTemp(self):
         # Reads the raw (uncompensated) temperature from the sensor
-        self.i2c.write8(self.__BMP085_CONTROL, self.__BMP085_READTEMPCMD)
-        time.sleep(0.005)  # Wait 5ms
-        raw = self.i2c.readU16(self.__BMP085_TEMPDATA)
-        
-        return raw
+        with self.conversionLock, self.i2c.deviceSequence():
+            self.startTempConversion()
+            time.sleep(self.temperatureDelay())
+            return self.readTempResult()
 
     def readRawPressure(self):
         # Reads the raw (uncompensated) pressure level from the sensor
-        self.i2c.write8(self.__BMP085_CONTROL, self.__BMP085_READPRESSURECMD + (self.mode << 6))
+        with self.conversionLock, self.i2c.deviceSequence():
+            self.startPressureConversion()
+            time.sleep(self.pressureDelay())
+            return self.readPressureResult()
+
+    def temperatureDelay(self):
+        # Temperature conversion time in seconds, 5ms in every mode
+        return 0.005
+
+    def pressureDelay(self):
+        # Pressure conversion time of the current oversampling mode in seconds
         if (self.mode == self.__BMP085_ULTRALOWPOWER):
-            time.sleep(0.005)
+            return 0.005
         elif (self.mode == self.__BMP085_HIGHRES):
-            time.sleep(0.014)
+            return 0.014
         elif (self.mode == self.__BMP085_ULTRAHIGHRES):
-            time.sleep(0.026)
+            return 0.026
         else:
-          time.sleep(0.008)
-          
-        msb = self.i2c.readU8(self.__BMP085_PRESSUREDATA)
-        lsb = self.i2c.readU8(self.__BMP085_PRESSUREDATA + 1)
-        xlsb = self.i2c.readU8(self.__BMP085_PRESSUREDATA + 2)
-        
-        raw = ((msb << 16) + (lsb << 8) + xlsb) >> (8 - self.mode)
-        
-        return raw
+            return 0.008
 
-    def readTemperature(self):
-        # Gets the compensated temperature in degrees celcius
-        UT = 0
-        X1 = 0
-        X2 = 0
-        B5 = 0
-        temp = 0.0
+    def updateResultTTLs(self):
+        # The chip has no output data rate, a new value takes one conversion.
+        # Call again after changing mode, setTTL on results for longer ttls.
+        if not self.cacheResults:
+            return
+        self.results.setTTL('readTemperature', self.temperatureDelay())
+        self.results.setTTL('readPressure', self.temperatureDelay() + self.pressureDelay())
 
-        # Read raw temp before aligning it with the calibration values
-        UT = self.readRawTemp()
+    def computeB5(self, UT):
+        # True Temperature Calculations
         X1 = ((UT - self._cal_AC6) * self._cal_AC5) >> 15
-        X2 = (self._cal_MC << 11) / (X1 + self._cal_MD)
-        B5 = X1 + X2
+        X2 = (self._cal_MC << 11) // (X1 + self._cal_MD)
+        return X1 + X2
+
+    def compensateTemperature(self, UT):
+        # Aligns a raw temperature with the calibration values, degrees celcius
+        B5 = self.computeB5(UT)
         temp = ((B5 + 8) >> 4) / 10.0
         
         return temp
 
-    def readPressure(self):
-        # Gets the compensated pressure in pascal
-        UT = 0
-        UP = 0
-        B3 = 0
-        B5 = 0
-        B6 = 0
-        X1 = 0
-        X2 = 0
-        X3 = 0
-        p = 0
-        B4 = 0
-        B7 = 0
-
-        UT = self.readRawTemp()
-        UP = self.readRawPressure()
-
-        # True Temperature Calculations
-        X1 = ((UT - self._cal_AC6) * self._cal_AC5) >> 15
-        X2 = (self._cal_MC << 11) / (X1 + self._cal_MD)
-        B5 = X1 + X2
+    def compensatePressure(self, UT, UP):
+        # Aligns a raw pressure with the calibration values, pascal
+        B5 = self.computeB5(UT)
 
         # Pressure Calculations
         B6 = B5 - 4000
         X1 = (self._cal_B2 * (B6 * B6) >> 12) >> 11
         X2 = (self._cal_AC2 * B6) >> 11
         X3 = X1 + X2
-        B3 = (((self._cal_AC1 * 4 + X3) << self.mode) + 2) / 4
+        B3 = (((self._cal_AC1 * 4 + X3) << self.mode) + 2) // 4
 
         X1 = (self._cal_AC3 * B6) >> 13
         X2 = (self._cal_B1 * ((B6 * B6) >> 12)) >> 16
@@ -161,9 +191,9 @@ class BMP085:
         B7 = (UP - B3) * (50000 >> self.mode)
 
         if (B7 < 0x80000000):
-            p = (B7 * 2) / B4
+            p = (B7 * 2) // B4
         else:
-            p = (B7 / B4) * 2
+            p = (B7 // B4) * 2
 
         X1 = (p >> 8) * (p >> 8)
         X1 = (X1 * 3038) >> 16
@@ -173,11 +203,112 @@ class BMP085:
 
         return p
 
-    def readAltitude(self, seaLevelPressure = 101325):
+    @cachedResult
+    def readTemperature(self):
+        # Gets the compensated temperature in degrees celcius
+        UT = self.readRawTemp()
+        return self.compensateTemperature(UT)
+
+    @cachedResult
+    def readPressure(self):
+        # Gets the compensated pressure in pascal
+        UT = self.readRawTemp()
+        UP = self.readRawPressure()
+        return self.compensatePressure(UT, UP)
+
+    def readAltitude(self, seaLevelPressure = 101325, bypass = False):
         # Calculates the altitude in meters
         altitude = 0.0
-        pressure = float(self.readPressure())
+        pressure = float(self.readPressure(bypass = bypass))
         altitude = 44330.0 * (1.0 - pow(pressure / seaLevelPressure, 0.1903))
         
         return altitude
-        return 0
\ No newline at end of file
+        return 0
+
+    # Scheduler (scheduler.py) variants, generators that yield the conversion
+    # wait so the scheduler can use the bus for other jobs in the meantime
+
+    def readRawTempSteps(self):
+        # a poll in another thread or job may be half way through a conversion
+        while not self.conversionLock.acquire(False):
+            yield 0.001
+        try:
+            with self.i2c.deviceSequence():
+                self.startTempConversion()
+                yield self.temperatureDelay()
+                return self.readTempResult()
+        finally:
+            self.conversionLock.release()
+
+    def readRawPressureSteps(self):
+        while not self.conversionLock.acquire(False):
+            yield 0.001
+        try:
+            with self.i2c.deviceSequence():
+                self.startPressureConversion()
+                yield self.pressureDelay()
+                return self.readPressureResult()
+        finally:
+            self.conversionLock.release()
+
+    def readTemperatureSteps(self):
+        UT = yield from self.readRawTempSteps()
+        return self.compensateTemperature(UT)
+
+    def readPressureSteps(self):
+        # e.g. scheduler.addJob('pressure', bmp.readPressureSteps, 4, cost = ...)
+        UT = yield from self.readRawTempSteps()
+        UP = yield from self.readRawPressureSteps()
+        return self.compensatePressure(UT, UP)
+
+    # asyncio variants, conversion waits are awaited instead of slept so the
+    # event loop keeps serving other sensors
+
+    async def acquireConversionLockAsync(self):
+        # conversionLock without blocking the event loop, or the bus executor
+        # the current holder may need to finish its sequence
+        while not self.conversionLock.acquire(False):
+            await asyncio.sleep(0.001)
+
+    async def readRawTempAsync(self):
+        aio = getAsync(self.i2c)
+        await self.acquireConversionLockAsync()
+        try:
+            await aio.holdDevice()
+            try:
+                await aio.run(self.startTempConversion)
+                await asyncio.sleep(self.temperatureDelay())
+                return await aio.run(self.readTempResult)
+            finally:
+                await aio.releaseDevice()
+        finally:
+            self.conversionLock.release()
+
+    async def readRawPressureAsync(self):
+        aio = getAsync(self.i2c)
+        await self.acquireConversionLockAsync()
+        try:
+            await aio.holdDevice()
+            try:
+                await aio.run(self.startPressureConversion)
+                await asyncio.sleep(self.pressureDelay())
+                return await aio.run(self.readPressureResult)
+            finally:
+                await aio.releaseDevice()
+        finally:
+            self.conversionLock.release()
+
+    async def readTemperatureAsync(self):
+        UT = await self.readRawTempAsync()
+        return self.compensateTemperature(UT)
+
+    async def readPressureAsync(self):
+        UT = await self.readRawTempAsync()
+        UP = await self.readRawPressureAsync()
+        return self.compensatePressure(UT, UP)
+
+    async def readAltitudeAsync(self, seaLevelPressure = 101325):
+        pressure = float(await self.readPressureAsync())
+        return 44330.0 * (1.0 - pow(pressure / seaLevelPressure, 0.1903))
+
+registerDriver(BMP085, (0x77,))
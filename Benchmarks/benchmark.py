@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# External Imports
+pass
+
+# the drivers import pycomms as a top level module, same as the examples
+# expect, so put every package directory on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('PyComms', 'MPU6050', 'HMC5883L', 'BMP085', 'PCA9685'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+# Custom Imports
+from simbus import SimBus, WireTiming, SCL_STANDARD, SCL_FAST
+from simdevices import MPU6050Sim, BMP085Sim, HMC5883LSim, PCA9685Sim
+from mpu6050 import MPU6050
+from hmc5883l import HMC5883L
+from bmp085 import BMP085
+from pca9685 import PCA9685
+
+# ===========================================================================
+# Driver benchmarks against the simulated bus
+# ===========================================================================
+
+# Every benchmark reports per call: bus transactions, bytes read and written,
+# the time the traffic would take on a real bus at the chosen SCL clock
+# (SimBus wire model) and the measured wall time, which includes the python
+# overhead and any sleep() the driver does while waiting on the chip.
+
+def measure(name, bus, call, iterations):
+    bus.resetCounters()
+    start = time.perf_counter()
+    for i in range(iterations):
+        call()
+    wall = time.perf_counter() - start
+
+    return {
+        'name' : name,
+        'iterations' : iterations,
+        'transactions' : bus.transactions / float(iterations),
+        'bytesRead' : bus.bytesRead / float(iterations),
+        'bytesWritten' : bus.bytesWritten / float(iterations),
+        'busTime' : bus.busTime / float(iterations),
+        'wallTime' : wall / iterations}
+
+def makeBus(args, address, device):
+    bus = SimBus(args.blockMax, WireTiming(args.scl))
+    bus.addDevice(address, device)
+    return bus
+
+def benchMPU6050(args):
+    bus = makeBus(args, 0x68, MPU6050Sim())
+    mpu = MPU6050(bus = bus)
+    results = [measure('MPU6050.dmpInitialize', bus, mpu.dmpInitialize, args.scale(3))]
+
+    mpu.setDMPEnabled(True)
+    packetSize = mpu.dmpGetFIFOPacketSize()
+
+    def readPacket():
+        mpu.getFIFOCount()
+        return mpu.getFIFOBytes(packetSize)
+
+    results.append(measure('MPU6050.getFIFOCount+getFIFOBytes', bus, readPacket, args.scale(500)))
+    # only the transfer itself, the count read above is what refills the sim FIFO
+    results.append(measure('MPU6050.getFIFOBytes', bus, lambda: mpu.getFIFOBytes(packetSize), args.scale(500)))
+
+    packet = readPacket()
+    results.append(measure('MPU6050.dmpGetQuaternion', bus, lambda: mpu.dmpGetQuaternion(packet), args.scale(20000)))
+
+    def yawPitchRoll():
+        q = mpu.dmpGetQuaternion(packet)
+        return mpu.dmpGetYawPitchRoll(q, mpu.dmpGetGravity(q))
+
+    results.append(measure('MPU6050.dmpGetYawPitchRoll', bus, yawPitchRoll, args.scale(20000)))
+    return results
+
+def benchHMC5883L(args):
+    bus = makeBus(args, 0x1E, HMC5883LSim())
+    mag = HMC5883L(bus = bus)
+    mag.initialize()
+
+    def heading():
+        # never answered from the result cache
+        mag.results.invalidate()
+        return mag.getHeading()
+    return [measure('HMC5883L.getHeading', bus, heading, args.scale(1000))]
+
+def benchBMP085(args):
+    bus = makeBus(args, 0x77, BMP085Sim())
+    bmp = BMP085(bus = bus)
+    return [measure('BMP085.readPressure', bus, lambda: bmp.readPressure(bypass = True), args.scale(20))]
+
+def benchPCA9685(args):
+    bus = makeBus(args, 0x40, PCA9685Sim())
+    pwm = PCA9685(bus = bus)
+    return [
+        measure('PCA9685.setPWMFreq', bus, lambda: pwm.setPWMFreq(60), args.scale(20)),
+        measure('PCA9685.setPWM', bus, lambda: pwm.setPWM(0, 0, 2048), args.scale(1000))]
+
+BENCHMARKS = {
+    'mpu6050' : benchMPU6050,
+    'hmc5883l' : benchHMC5883L,
+    'bmp085' : benchBMP085,
+    'pca9685' : benchPCA9685}
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks the drivers against the simulated bus, results are JSON')
+    parser.add_argument('--scl', type = int, default = SCL_FAST, help = 'SCL clock in Hz (%d or %d)' % (SCL_STANDARD, SCL_FAST))
+    parser.add_argument('--block-max', dest = 'blockMax', type = int, default = 32, help = 'largest block transfer of the bus')
+    parser.add_argument('--iterations', type = float, default = 1.0, help = 'scales the iteration count of every benchmark')
+    parser.add_argument('--output', help = 'write the results to this file instead of stdout')
+    parser.add_argument('drivers', nargs = '*', help = 'drivers to run (%s), all by default' % ', '.join(sorted(BENCHMARKS)))
+    args = parser.parse_args(argv)
+    for name in args.drivers:
+        if name not in BENCHMARKS:
+            parser.error('unknown driver %s' % name)
+    args.scale = lambda count: max(1, int(count * args.iterations))
+
+    results = []
+    for name in args.drivers or sorted(BENCHMARKS):
+        results.extend(BENCHMARKS[name](args))
+
+    report = {
+        'python' : platform.python_version(),
+        'implementation' : platform.python_implementation(),
+        'scl' : args.scl,
+        'blockMax' : args.blockMax,
+        'results' : results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2, sort_keys = True)
+    else:
+        json.dump(report, sys.stdout, indent = 2, sort_keys = True)
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
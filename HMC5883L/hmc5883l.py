@@ -7,7 +7,10 @@ pass
 pass
 
 # Custom Imports
-from pycomms import PyComms
+from pycomms import PyComms, BitField
+from asyncpycomms import getAsync
+from busscan import registerDriver
+from resultcache import ResultCache, cachedResult
 
 class HMC5883L:
     # Register map based on Jeff Rowberg <jeff@rowberg.net> source code at
@@ -50,6 +53,17 @@ class HMC5883L:
     HMC5883L_RATE_30            = 0x05
     HMC5883L_RATE_75            = 0x06
 
+    # output rate in Hz by rate setting, single measurements go up to 160 Hz
+    HMC5883L_RATE_HZ = {
+        HMC5883L_RATE_0P75 : 0.75,
+        HMC5883L_RATE_1P5  : 1.5,
+        HMC5883L_RATE_3    : 3,
+        HMC5883L_RATE_7P5  : 7.5,
+        HMC5883L_RATE_15   : 15,
+        HMC5883L_RATE_30   : 30,
+        HMC5883L_RATE_75   : 75}
+    HMC5883L_SINGLE_RATE_HZ = 160
+
     HMC5883L_BIAS_NORMAL        = 0x00
     HMC5883L_BIAS_POSITIVE      = 0x01
     HMC5883L_BIAS_NEGATIVE      = 0x02
@@ -76,12 +90,44 @@ class HMC5883L:
     HMC5883L_STATUS_LOCK_BIT    = 1
     HMC5883L_STATUS_READY_BIT   = 0   
     
+    # register fields, mask and shift precomputed once
+    HMC5883L_FIELD_AVERAGE      = BitField(HMC5883L_RA_CONFIG_A, HMC5883L_CRA_AVERAGE_BIT, HMC5883L_CRA_AVERAGE_LENGTH)
+    HMC5883L_FIELD_RATE         = BitField(HMC5883L_RA_CONFIG_A, HMC5883L_CRA_RATE_BIT, HMC5883L_CRA_RATE_LENGTH)
+    HMC5883L_FIELD_BIAS         = BitField(HMC5883L_RA_CONFIG_A, HMC5883L_CRA_BIAS_BIT, HMC5883L_CRA_BIAS_LENGTH)
+    HMC5883L_FIELD_GAIN         = BitField(HMC5883L_RA_CONFIG_B, HMC5883L_CRB_GAIN_BIT, HMC5883L_CRB_GAIN_LENGTH)
+    HMC5883L_FIELD_MODE         = BitField(HMC5883L_RA_MODE, HMC5883L_MODEREG_BIT, HMC5883L_MODEREG_LENGTH)
+    
+    # registers the chip changes by itself, never kept in the shadow cache
+    # (MODE falls back to idle after a single measurement)
+    HMC5883L_VOLATILE_REGISTERS = [
+        HMC5883L_RA_MODE,
+        HMC5883L_RA_DATAX_H,
+        HMC5883L_RA_DATAX_L,
+        HMC5883L_RA_DATAZ_H,
+        HMC5883L_RA_DATAZ_L,
+        HMC5883L_RA_DATAY_H,
+        HMC5883L_RA_DATAY_L,
+        HMC5883L_RA_STATUS]
+    
     mode = 0
+    # power on default, kept up to date by initialize / setDataRate
+    dataRate = HMC5883L_RATE_15
 
-    def __init__(self, address = HMC5883L_DEFAULT_ADDRESS):
-        self.i2c = PyComms(address)
+    def __init__(self, address = HMC5883L_DEFAULT_ADDRESS, bus = None, cache = False, cacheResults = False):
+        self.i2c = PyComms(address, bus)
         self.address = address
         
+        # with cacheResults readAxes (and the getHeading* built on it)
+        # results are reused for one output period, results.age('readAxes')
+        # tells how old they are. Off by default, every call reads the chip.
+        self.cacheResults = cacheResults
+        self.results = ResultCache()
+        self.updateResultTTL()
+        
+        if cache:
+            # shadow config registers so bit setters skip the read-modify-write read
+            self.i2c.enableCache(self.HMC5883L_VOLATILE_REGISTERS)
+        
     def initialize(self):
         # write CONFIG_A register
         self.i2c.write8(self.HMC5883L_RA_CONFIG_A,
@@ -89,6 +135,8 @@ class HMC5883L:
             (self.HMC5883L_RATE_15     << (self.HMC5883L_CRA_RATE_BIT - self.HMC5883L_CRA_RATE_LENGTH + 1)) |
             (self.HMC5883L_BIAS_NORMAL << (self.HMC5883L_CRA_BIAS_BIT - self.HMC5883L_CRA_BIAS_LENGTH + 1)))
 
+        self.dataRate = self.HMC5883L_RATE_15
+
         # write CONFIG_B register
         self.setGain(self.HMC5883L_GAIN_1090);
     
@@ -96,79 +144,102 @@ class HMC5883L:
         self.setMode(self.HMC5883L_MODE_SINGLE);      
         
     def testConnection(self):
-        pass
+        return self.detect(self.i2c)
+
+    @classmethod
+    def detect(cls, i2c):
+        # busscan check, the identification registers read 'H43'
+        return i2c.readBytesListU(cls.HMC5883L_RA_ID_A, 3) == [ord('H'), ord('4'), ord('3')]
         
     def getSampleAveraging(self):
-        pass
+        return self.i2c.readField(self.HMC5883L_FIELD_AVERAGE)
     
     def setSampleAveraging(self, value):
-        self.i2c.writeBits(self.HMC5883L_RA_CONFIG_A, self.HMC5883L_CRA_AVERAGE_BIT, self.HMC5883L_CRA_AVERAGE_LENGTH, value)
+        self.i2c.writeField(self.HMC5883L_FIELD_AVERAGE, value)
         
     def getDataRate(self):
-        pass
+        return self.i2c.readField(self.HMC5883L_FIELD_RATE)
     
     def setDataRate(self, value):
-        self.i2c.writeBits(self.HMC5883L_RA_CONFIG_A, self.HMC5883L_CRA_RATE_BIT, self.HMC5883L_CRA_RATE_LENGTH, value)
+        self.i2c.writeField(self.HMC5883L_FIELD_RATE, value)
+        self.dataRate = value
+        self.updateResultTTL()
+
+    def updateResultTTL(self):
+        # one output period of the current mode and rate
+        self.results.invalidate()
+        if not self.cacheResults:
+            return
+        if self.mode == self.HMC5883L_MODE_CONTINUOUS:
+            rate = self.HMC5883L_RATE_HZ.get(self.dataRate, self.HMC5883L_SINGLE_RATE_HZ)
+        else:
+            rate = self.HMC5883L_SINGLE_RATE_HZ
+        self.results.setTTL('readAxes', 1.0 / rate)
         
     def getMeasurementBias(self):
-        pass
+        return self.i2c.readField(self.HMC5883L_FIELD_BIAS)
     
     def setMeasurementBias(self, value):
-        self.i2c.writeBits(self.HMC5883L_RA_CONFIG_A, self.HMC5883L_CRA_BIAS_BIT, self.HMC5883L_CRA_BIAS_LENGTH, value);
+        self.i2c.writeField(self.HMC5883L_FIELD_BIAS, value)
+        
+    def getConfigA(self):
+        # averaging, data rate and bias from a single CONFIG_A read
+        return self.i2c.readFields(self.HMC5883L_FIELD_AVERAGE, self.HMC5883L_FIELD_RATE, self.HMC5883L_FIELD_BIAS)
         
     def getGain(self):
-        pass
+        return self.i2c.readField(self.HMC5883L_FIELD_GAIN)
         
     def setGain(self, value):
         self.i2c.write8(self.HMC5883L_RA_CONFIG_B, value << (self.HMC5883L_CRB_GAIN_BIT - self.HMC5883L_CRB_GAIN_LENGTH + 1))
+        # readings of the old gain are scaled differently
+        self.results.invalidate()
         
     def getMode(self):
-        pass
+        return self.i2c.readField(self.HMC5883L_FIELD_MODE)
     
     def setMode(self, newMode):
         # use this method to guarantee that bits 7-2 are set to zero, which is a
         # requirement specified in the datasheet
         self.i2c.write8(self.HMC5883L_RA_MODE, self.mode << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))
         self.mode = newMode # track to tell if we have to clear bit 7 after a read
+        self.updateResultTTL()
      
-    def getHeading(self):
-        packet = self.i2c.readBytesListS(self.HMC5883L_RA_DATAX_H, 6)
+    @cachedResult
+    def readAxes(self):
+        # X, Z, Y as signed 16-bit values, the output registers are in that order
+        axes = self.i2c.readWordsS(self.HMC5883L_RA_DATAX_H, 3)
         if (self.mode == self.HMC5883L_MODE_SINGLE):
-            self.i2c.write8(self.HMC5883L_RA_MODE, self.HMC5883L_MODE_SINGLE << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))  
+            self.i2c.write8(self.HMC5883L_RA_MODE, self.HMC5883L_MODE_SINGLE << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))
+        return axes
+
+    def getHeading(self):
+        x, z, y = self.readAxes()
            
         data = {
-            'x' : ((packet[0] << 8) | packet[1]),
-            'y' : ((packet[4] << 8) | packet[5]),
-            'z' : ((packet[2] << 8) | packet[3])}
+            'x' : x,
+            'y' : y,
+            'z' : z}
             
         return data    
         
+    async def getHeadingAsync(self):
+        # getHeading on the bus executor, for use from an asyncio event loop
+        return await getAsync(self.i2c).run(self.getHeading)
+        
     def getHeadingX(self):
         # each axis read requires that ALL axis registers be read, even if only
         # one is used; this was not done ineffiently in the code by accident
-        packet = self.i2c.readBytesListS(self.HMC5883L_RA_DATAX_H, 6)
-        if (self.mode == self.HMC5883L_MODE_SINGLE):
-            self.i2c.write8(self.HMC5883L_RA_MODE, self.HMC5883L_MODE_SINGLE << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))
-            
-        return ((packet[0] << 8) | packet[1])    
+        return self.readAxes()[0]    
         
     def getHeadingY(self):
         # each axis read requires that ALL axis registers be read, even if only
         # one is used; this was not done ineffiently in the code by accident
-        packet = self.i2c.readBytesListS(self.HMC5883L_RA_DATAX_H, 6)
-        if (self.mode == self.HMC5883L_MODE_SINGLE):
-            self.i2c.write8(self.HMC5883L_RA_MODE, self.HMC5883L_MODE_SINGLE << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))
-            
-        return ((packet[4] << 8) | packet[5])    
+        return self.readAxes()[2]    
         
     def getHeadingZ(self):
         # each axis read requires that ALL axis registers be read, even if only
         # one is used; this was not done ineffiently in the code by accident
-        packet = self.i2c.readBytesListS(self.HMC5883L_RA_DATAX_H, 6)
-        if (self.mode == self.HMC5883L_MODE_SINGLE):
-            self.i2c.write8(self.HMC5883L_RA_MODE, self.HMC5883L_MODE_SINGLE << (self.HMC5883L_MODEREG_BIT - self.HMC5883L_MODEREG_LENGTH + 1))
-            
-        return ((packet[2] << 8) | packet[3])    
+        return self.readAxes()[1]    
         
     def getLockStatus(self):
         result = self.i2c.readBit(self.HMC5883L_RA_STATUS, self.HMC5883L_STATUS_LOCK_BIT)
@@ -179,13 +250,15 @@ class HMC5883L:
         return result
         
     def getIDA(self):
-        result = self.i2c.readByte(self.HMC5883L_RA_ID_A)
+        result = self.i2c.readU8(self.HMC5883L_RA_ID_A)
         return result
         
     def getIDB(self):
-        result = self.i2c.readByte(self.HMC5883L_RA_ID_B)
+        result = self.i2c.readU8(self.HMC5883L_RA_ID_B)
         return result
 
     def getIDC(self):
-        result = self.i2c.readByte(self.HMC5883L_RA_ID_C)
-        return result       
\ No newline at end of file
+        result = self.i2c.readU8(self.HMC5883L_RA_ID_C)
+        return result       
+
+registerDriver(HMC5883L, (HMC5883L.HMC5883L_ADDRESS,))
@@ -10,9 +10,17 @@ mpu.setDMPEnabled(True)
 # get expected DMP packet size for later comparison
 packetSize = mpu.dmpGetFIFOPacketSize() 
 
+# every packet is read into the same buffer
+packet = bytearray(packetSize)
+
+# with the INT pin wired to a GPIO the loop sleeps until the DMP has data
+# instead of polling INT_STATUS, e.g. line 17 of /dev/gpiochip0:
+#   from interrupt import InterruptSource
+#   mpu.setInterruptSource(InterruptSource.fromGpioChip(0, 17))
+
 while True:
     # Get INT_STATUS byte
-    mpuIntStatus = mpu.getIntStatus()
+    mpuIntStatus = mpu.waitForIntStatus()
   
     if mpuIntStatus >= 2: # check for DMP data ready interrupt (this should happen frequently) 
         # get current FIFO count
@@ -30,8 +38,8 @@ while True:
         while fifoCount < packetSize:
             fifoCount = mpu.getFIFOCount()
         
-        result = mpu.getFIFOBytes(packetSize)
-        q = mpu.dmpGetQuaternion(result)
+        mpu.getFIFOBytesInto(packet)
+        q = mpu.dmpGetQuaternion(packet)
         g = mpu.dmpGetGravity(q)
         ypr = mpu.dmpGetYawPitchRoll(q, g)
         
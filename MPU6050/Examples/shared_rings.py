@@ -0,0 +1,53 @@
+import mpu6050
+import hmc5883l
+import bmp085
+from scheduler import Scheduler
+from samplering import SampleRing, QUATERNION_RECORD, MOTION_RECORD, HEADING_RECORD, PRESSURE_RECORD
+
+# Polls the sensors and publishes into shared memory rings, other processes
+# (logger, controller, UI) read them with:
+#   ring = SampleRing.attach('imu-quaternion')
+#   reader = RingReader(ring)
+#   for seq, (timestamp, w, x, y, z) in reader.poll(): ...
+
+# Sensor initialization
+mpu = mpu6050.MPU6050()
+mpu.dmpInitialize()
+mpu.setDMPEnabled(True)
+packetSize = mpu.dmpGetFIFOPacketSize()
+packet = bytearray(packetSize)
+
+mag = hmc5883l.HMC5883L()
+mag.initialize()
+
+baro = bmp085.BMP085()
+
+quaternions = SampleRing(QUATERNION_RECORD, 1024, 'imu-quaternion')
+motion = SampleRing(MOTION_RECORD, 1024, 'imu-motion')
+headings = SampleRing(HEADING_RECORD, 256, 'mag-heading')
+pressures = SampleRing(PRESSURE_RECORD, 64, 'baro-pressure')
+
+def readQuaternion():
+    if mpu.getFIFOCount() < packetSize:
+        return None
+    mpu.getFIFOBytesInto(packet)
+    q = mpu.dmpGetQuaternion(packet)
+    return q['w'], q['x'], q['y'], q['z']
+
+def readPressure():
+    # conversion waits are yielded, the other jobs get the bus meanwhile
+    UT = yield from baro.readRawTempSteps()
+    UP = yield from baro.readRawPressureSteps()
+    return baro.compensatePressure(UT, UP), baro.compensateTemperature(UT)
+
+scheduler = Scheduler()
+scheduler.addJob('quaternion', readQuaternion, 200, cost = 0.0015, onResult = quaternions.publisher())
+scheduler.addJob('motion', mpu.getMotion6, 100, cost = 0.0005, onResult = motion.publisher())
+scheduler.addJob('heading', mag.readAxes, 75, cost = 0.0004, onResult = headings.publisher(lambda xzy: (xzy[0], xzy[2], xzy[1])))
+scheduler.addJob('pressure', readPressure, 2, cost = 0.001, onResult = pressures.publisher())
+
+try:
+    scheduler.run()
+finally:
+    for ring in (quaternions, motion, headings, pressures):
+        ring.close()
@@ -1,14 +1,17 @@
 #!/usr/bin/python
 
 # Python Standard Library Imports
-from time import sleep
+from time import sleep, monotonic
 from math import atan, atan2, sqrt
 
 # External Imports
 pass
 
 # Custom Imports
-from pycomms import PyComms
+from pycomms import PyComms, PRIORITY_HIGH, BitField
+from asyncpycomms import getAsync
+from decode import unpack
+from busscan import registerDriver
 
 class MPU6050:
     # Register map based on Jeff Rowberg <jeff@rowberg.net> source code at
@@ -369,6 +372,47 @@ class MPU6050:
     MPU6050_WHO_AM_I_BIT          = 6
     MPU6050_WHO_AM_I_LENGTH       = 6    
     
+    # registers the chip changes by itself, never kept in the shadow cache
+    MPU6050_VOLATILE_REGISTERS = [
+        MPU6050_RA_I2C_MST_STATUS,
+        MPU6050_RA_I2C_SLV4_DI,
+        MPU6050_RA_DMP_INT_STATUS,
+        MPU6050_RA_INT_STATUS,
+        MPU6050_RA_MOT_DETECT_STATUS,
+        MPU6050_RA_BANK_SEL,
+        MPU6050_RA_MEM_START_ADDR,
+        MPU6050_RA_MEM_R_W,
+        MPU6050_RA_FIFO_COUNTH,
+        MPU6050_RA_FIFO_COUNTL,
+        MPU6050_RA_FIFO_R_W] + list(range(MPU6050_RA_ACCEL_XOUT_H, MPU6050_RA_EXT_SENS_DATA_23 + 1))
+    
+    # reset bits that clear themselves once the reset is done
+    MPU6050_SELF_CLEARING_BITS = {
+        MPU6050_RA_SIGNAL_PATH_RESET : 0x07,
+        MPU6050_RA_USER_CTRL         : 0x0F,
+        MPU6050_RA_PWR_MGMT_1        : 0x80}
+
+    # w, x, y, z int16 at offsets 0, 4, 8 and 12 of a DMP packet
+    MPU6050_DMP_QUATERNION_FORMAT = '>h2xh2xh2xh'
+
+    # multi-bit register fields, mask and shift precomputed once
+    MPU6050_FIELD_EXT_SYNC_SET     = BitField(MPU6050_RA_CONFIG, MPU6050_CFG_EXT_SYNC_SET_BIT, MPU6050_CFG_EXT_SYNC_SET_LENGTH)
+    MPU6050_FIELD_DLPF_CFG         = BitField(MPU6050_RA_CONFIG, MPU6050_CFG_DLPF_CFG_BIT, MPU6050_CFG_DLPF_CFG_LENGTH)
+    MPU6050_FIELD_FS_SEL           = BitField(MPU6050_RA_GYRO_CONFIG, MPU6050_GCONFIG_FS_SEL_BIT, MPU6050_GCONFIG_FS_SEL_LENGTH)
+    MPU6050_FIELD_AFS_SEL          = BitField(MPU6050_RA_ACCEL_CONFIG, MPU6050_ACONFIG_AFS_SEL_BIT, MPU6050_ACONFIG_AFS_SEL_LENGTH)
+    MPU6050_FIELD_ACCEL_HPF        = BitField(MPU6050_RA_ACCEL_CONFIG, MPU6050_ACONFIG_ACCEL_HPF_BIT, MPU6050_ACONFIG_ACCEL_HPF_LENGTH)
+    MPU6050_FIELD_I2C_MST_CLK      = BitField(MPU6050_RA_I2C_MST_CTRL, MPU6050_I2C_MST_CLK_BIT, MPU6050_I2C_MST_CLK_LENGTH)
+    MPU6050_FIELD_I2C_SLV4_MST_DLY = BitField(MPU6050_RA_I2C_SLV4_CTRL, MPU6050_I2C_SLV4_MST_DLY_BIT, MPU6050_I2C_SLV4_MST_DLY_LENGTH)
+    MPU6050_FIELD_ACCEL_ON_DELAY   = BitField(MPU6050_RA_MOT_DETECT_CTRL, MPU6050_DETECT_ACCEL_ON_DELAY_BIT, MPU6050_DETECT_ACCEL_ON_DELAY_LENGTH)
+    MPU6050_FIELD_FF_COUNT         = BitField(MPU6050_RA_MOT_DETECT_CTRL, MPU6050_DETECT_FF_COUNT_BIT, MPU6050_DETECT_FF_COUNT_LENGTH)
+    MPU6050_FIELD_MOT_COUNT        = BitField(MPU6050_RA_MOT_DETECT_CTRL, MPU6050_DETECT_MOT_COUNT_BIT, MPU6050_DETECT_MOT_COUNT_LENGTH)
+    MPU6050_FIELD_CLKSEL           = BitField(MPU6050_RA_PWR_MGMT_1, MPU6050_PWR1_CLKSEL_BIT, MPU6050_PWR1_CLKSEL_LENGTH)
+    MPU6050_FIELD_LP_WAKE_CTRL     = BitField(MPU6050_RA_PWR_MGMT_2, MPU6050_PWR2_LP_WAKE_CTRL_BIT, MPU6050_PWR2_LP_WAKE_CTRL_LENGTH)
+    MPU6050_FIELD_WHO_AM_I         = BitField(MPU6050_RA_WHO_AM_I, MPU6050_WHO_AM_I_BIT, MPU6050_WHO_AM_I_LENGTH)
+    MPU6050_FIELD_XG_OFFS_TC       = BitField(MPU6050_RA_XG_OFFS_TC, MPU6050_TC_OFFSET_BIT, MPU6050_TC_OFFSET_LENGTH)
+    MPU6050_FIELD_YG_OFFS_TC       = BitField(MPU6050_RA_YG_OFFS_TC, MPU6050_TC_OFFSET_BIT, MPU6050_TC_OFFSET_LENGTH)
+    MPU6050_FIELD_ZG_OFFS_TC       = BitField(MPU6050_RA_ZG_OFFS_TC, MPU6050_TC_OFFSET_BIT, MPU6050_TC_OFFSET_LENGTH)
+    
     # DMP
     
     MPU6050_DMP_MEMORY_BANKS      = 8
@@ -584,10 +628,20 @@ class MPU6050:
     dmpPacketSize = 42
     
     # construct a new object with the I2C address of the MPU6050
-    def __init__(self, address = MPU6050_DEFAULT_ADDRESS):
-        self.i2c = PyComms(address)
+    def __init__(self, address = MPU6050_DEFAULT_ADDRESS, bus = None, cache = False):
+        self.i2c = PyComms(address, bus)
         self.address = address
         
+        # memory and FIFO ports don't advance the register pointer
+        self.i2c.fixedRegisters = set([self.MPU6050_RA_MEM_R_W, self.MPU6050_RA_FIFO_R_W])
+        
+        # INT pin wait, see setInterruptSource
+        self.interruptSource = None
+        
+        if cache:
+            # shadow config registers so bit setters skip the read-modify-write read
+            self.i2c.enableCache(self.MPU6050_VOLATILE_REGISTERS, self.MPU6050_SELF_CLEARING_BITS)
+        
     def initialize(self):
         self.setClockSource(self.MPU6050_CLOCK_PLL_XGYRO)
         self.setFullScaleGyroRange(self.MPU6050_GYRO_FS_250)
@@ -596,6 +650,11 @@ class MPU6050:
         
     def testConnection(self):
         return self.getDeviceID() == 0x34
+
+    @classmethod
+    def detect(cls, i2c):
+        # busscan check, WHO_AM_I holds the upper 6 bits of the AD0 low address
+        return i2c.readField(cls.MPU6050_FIELD_WHO_AM_I) == 0x34
     
     def getAuxVDDIOLevel(self):
         return self.i2c.readBit(self.MPU6050_RA_YG_OFFS_TC, self.MPU6050_TC_PWR_MODE_BIT)
@@ -610,22 +669,22 @@ class MPU6050:
         self.i2c.write8(self.MPU6050_RA_SMPLRT_DIV, value)
     
     def getExternalFrameSync(self):
-        return self.i2c.readBits(self.MPU6050_RA_CONFIG, self.MPU6050_CFG_EXT_SYNC_SET_BIT, self.MPU6050_CFG_EXT_SYNC_SET_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_EXT_SYNC_SET)
 
     def setExternalFrameSync(self, sync):
-        self.i2c.writeBits(self.MPU6050_RA_CONFIG, self.MPU6050_CFG_EXT_SYNC_SET_BIT, self.MPU6050_CFG_EXT_SYNC_SET_LENGTH, sync)
+        self.i2c.writeField(self.MPU6050_FIELD_EXT_SYNC_SET, sync)
     
     def getDLPFMode(self):
-        return self.i2c.readBits(self.MPU6050_RA_CONFIG, self.MPU6050_CFG_DLPF_CFG_BIT, self.MPU6050_CFG_DLPF_CFG_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_DLPF_CFG)
         
     def setDLPFMode(self, mode):
-        self.i2c.writeBits(self.MPU6050_RA_CONFIG, self.MPU6050_CFG_DLPF_CFG_BIT, self.MPU6050_CFG_DLPF_CFG_LENGTH, mode)
+        self.i2c.writeField(self.MPU6050_FIELD_DLPF_CFG, mode)
      
     def getFullScaleGyroRange(self):
-        return self.i2c.readBits(self.MPU6050_RA_GYRO_CONFIG, self.MPU6050_GCONFIG_FS_SEL_BIT, self.MPU6050_GCONFIG_FS_SEL_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_FS_SEL)
 
     def setFullScaleGyroRange(self, range):
-        self.i2c.writeBits(self.MPU6050_RA_GYRO_CONFIG, self.MPU6050_GCONFIG_FS_SEL_BIT, self.MPU6050_GCONFIG_FS_SEL_LENGTH, range)        
+        self.i2c.writeField(self.MPU6050_FIELD_FS_SEL, range)        
     
     def getAccelXSelfTest(self):
         return self.i2c.readBit(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_XA_ST_BIT)
@@ -646,16 +705,16 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_ZA_ST_BIT, enabled)
 
     def getFullScaleAccelRange(self):
-        return self.i2c.readBits(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_AFS_SEL_BIT, self.MPU6050_ACONFIG_AFS_SEL_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_AFS_SEL)
         
     def setFullScaleAccelRange(self, value):
-        self.i2c.writeBits(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_AFS_SEL_BIT, self.MPU6050_ACONFIG_AFS_SEL_LENGTH, value)
+        self.i2c.writeField(self.MPU6050_FIELD_AFS_SEL, value)
             
     def getDHPFMode(self):
-        return self.i2c.readBits(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_ACCEL_HPF_BIT, self.MPU6050_ACONFIG_ACCEL_HPF_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_ACCEL_HPF)
 
     def setDHPFMode(self, bandwith):
-        self.i2c.writeBits(self.MPU6050_RA_ACCEL_CONFIG, self.MPU6050_ACONFIG_ACCEL_HPF_BIT, self.MPU6050_ACONFIG_ACCEL_HPF_LENGTH, bandwidth)
+        self.i2c.writeField(self.MPU6050_FIELD_ACCEL_HPF, bandwith)
 
     def getFreefallDetectionThreshold(self):
         return self.i2c.readU8(self.MPU6050_RA_FF_THR)
@@ -751,7 +810,7 @@ class MPU6050:
         return self.i2c.readBit(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_WAIT_FOR_ES_BIT)
         
     def setWaitForExternalSensorEnabled(self, value):
-        self.i2c.writeBit(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_WAIT_FOR_ES_BIT, enabled)
+        self.i2c.writeBit(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_WAIT_FOR_ES_BIT, value)
         
     def getSlave3FIFOEnabled(self):
         return self.i2c.readBit(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_SLV_3_FIFO_EN_BIT)
@@ -766,10 +825,10 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_I2C_MST_P_NSR_BIT, enabled)
         
     def getMasterClockSpeed(self):
-        return self.i2c.readBits(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_I2C_MST_CLK_BIT, self.MPU6050_I2C_MST_CLK_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_I2C_MST_CLK)
         
     def setMasterClockSpeed(self, speed):
-        self.i2c.writeBits(self.MPU6050_RA_I2C_MST_CTRL, self.MPU6050_I2C_MST_CLK_BIT, self.MPU6050_I2C_MST_CLK_LENGTH, speed)
+        self.i2c.writeField(self.MPU6050_FIELD_I2C_MST_CLK, speed)
         
     def getSlaveAddress(self, num):
         if num > 3:
@@ -880,10 +939,10 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_I2C_SLV4_CTRL, self.MPU6050_I2C_SLV4_REG_DIS_BIT, mode)
         
     def getSlave4MasterDelay(self):
-        return self.i2c.readBits(self.MPU6050_RA_I2C_SLV4_CTRL, self.MPU6050_I2C_SLV4_MST_DLY_BIT, self.MPU6050_I2C_SLV4_MST_DLY_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_I2C_SLV4_MST_DLY)
         
     def setSlave4MasterDelay(self, delay):
-        self.i2c.writeBits(self.MPU6050_RA_I2C_SLV4_CTRL, self.MPU6050_I2C_SLV4_MST_DLY_BIT, self.MPU6050_I2C_SLV4_MST_DLY_LENGTH, delay)
+        self.i2c.writeField(self.MPU6050_FIELD_I2C_SLV4_MST_DLY, delay)
         
     def getSlate4InputByte(self):
         return self.i2c.readU8(self.MPU6050_RA_I2C_SLV4_DI)
@@ -1005,6 +1064,30 @@ class MPU6050:
     def getIntStatus(self):
         return self.i2c.readU8(self.MPU6050_RA_INT_STATUS)
 
+    def setInterruptSource(self, source):
+        # interrupt.InterruptSource wired to the INT pin, e.g.
+        # InterruptSource.fromGpioChip(0, 17), None goes back to polling
+        self.interruptSource = source
+
+    def waitForIntStatus(self, timeout = None, pollInterval = 0.001):
+        # Blocks until an interrupt is flagged and returns INT_STATUS, 0 on
+        # timeout. With an interrupt source the bus is only used once the INT
+        # pin fired, without one INT_STATUS gets polled every pollInterval
+        # seconds.
+        if self.interruptSource is not None:
+            if not self.interruptSource.wait(timeout):
+                return 0
+            return self.getIntStatus()
+
+        end = None
+        if timeout is not None:
+            end = monotonic() + timeout
+        while True:
+            status = self.getIntStatus()
+            if status or (end is not None and monotonic() >= end):
+                return status
+            sleep(pollInterval)
+
     def getIntFreefallStatus(self):
         return self.i2c.readBit(self.MPU6050_RA_INT_STATUS, self.MPU6050_INTERRUPT_FF_BIT)
 
@@ -1028,34 +1111,37 @@ class MPU6050:
         pass
 
     def getMotion6(self):
-        pass
+        # ax, ay, az, gx, gy, gz raw values, read in one block with the
+        # temperature in between
+        ax, ay, az, temp, gx, gy, gz = self.i2c.readWordsS(self.MPU6050_RA_ACCEL_XOUT_H, 7)
+        return ax, ay, az, gx, gy, gz
 
     def getAcceleration(self):
-        pass
+        return self.i2c.readWordsS(self.MPU6050_RA_ACCEL_XOUT_H, 3)
         
     def getAccelerationX(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_ACCEL_XOUT_H)
         
     def getAccelerationY(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_ACCEL_YOUT_H)
         
     def getAccelerationZ(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_ACCEL_ZOUT_H)
         
     def getTemperature(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_TEMP_OUT_H)
         
     def getRotation(self):
-        pass
+        return self.i2c.readWordsS(self.MPU6050_RA_GYRO_XOUT_H, 3)
         
     def getRotationX(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_GYRO_XOUT_H)
         
     def getRotationY(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_GYRO_YOUT_H)
      
     def getRotationZ(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_GYRO_ZOUT_H)
       
     def getExternalSensorByte(self, position):
         return self.i2c.readU8(self.MPU6050_RA_EXT_SENS_DATA_00 + position)
@@ -1118,22 +1204,22 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_SIGNAL_PATH_RESET, self.MPU6050_PATHRESET_TEMP_RESET_BIT, True)
         
     def getAccelerometerPowerOnDelay(self):
-        return self.i2c.readBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_ACCEL_ON_DELAY_BIT, self.MPU6050_DETECT_ACCEL_ON_DELAY_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_ACCEL_ON_DELAY)
         
     def setAccelerometerPowerOnDelay(self, delay):
-        self.i2c.writeBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_ACCEL_ON_DELAY_BIT, self.MPU6050_DETECT_ACCEL_ON_DELAY_LENGTH, delay)
+        self.i2c.writeField(self.MPU6050_FIELD_ACCEL_ON_DELAY, delay)
         
     def getFreefallDetectionCounterDecrement(self):
-        return self.i2c.readBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_FF_COUNT_BIT, self.MPU6050_DETECT_FF_COUNT_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_FF_COUNT)
         
     def setFreefallDetectionCounterDecrement(self, decrement):
-        self.i2c.writeBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_FF_COUNT_BIT, self.MPU6050_DETECT_FF_COUNT_LENGTH, decrement)
+        self.i2c.writeField(self.MPU6050_FIELD_FF_COUNT, decrement)
         
     def getMotionDetectionCounterDecrement(self):
-        return self.i2c.readBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_MOT_COUNT_BIT, self.MPU6050_DETECT_MOT_COUNT_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_MOT_COUNT)
         
     def setMotionDetectionCounterDecrement(self, decrement):
-        self.i2c.writeBits(self.MPU6050_RA_MOT_DETECT_CTRL, self.MPU6050_DETECT_MOT_COUNT_BIT, self.MPU6050_DETECT_MOT_COUNT_LENGTH, decrement)
+        self.i2c.writeField(self.MPU6050_FIELD_MOT_COUNT, decrement)
         
     def getFIFOEnabled(self):
         return self.i2c.readBit(self.MPU6050_RA_USER_CTRL, self.MPU6050_USERCTRL_FIFO_EN_BIT)
@@ -1161,6 +1247,8 @@ class MPU6050:
         
     def reset(self):
         self.i2c.writeBit(self.MPU6050_RA_PWR_MGMT_1, self.MPU6050_PWR1_DEVICE_RESET_BIT, True)       
+        # every register is back at its power-on value
+        self.i2c.invalidateCache()
         
     def getSleepEnabled(self):
         return self.i2c.readBit(self.MPU6050_RA_PWR_MGMT_1, self.MPU6050_PWR1_SLEEP_BIT)
@@ -1183,16 +1271,16 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_PWR_MGMT_1, self.MPU6050_PWR1_TEMP_DIS_BIT, enabled != enabled)
         
     def getClockSource(self):
-        return self.i2c.readBits(self.MPU6050_RA_PWR_MGMT_1, self.MPU6050_PWR1_CLKSEL_BIT, self.MPU6050_PWR1_CLKSEL_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_CLKSEL)
         
     def setClockSource(self, source):
-        self.i2c.writeBits(self.MPU6050_RA_PWR_MGMT_1, self.MPU6050_PWR1_CLKSEL_BIT, self.MPU6050_PWR1_CLKSEL_LENGTH, source)        
+        self.i2c.writeField(self.MPU6050_FIELD_CLKSEL, source)        
         
     def getWakeFrequency(self):
-        return self.i2c.readBits(self.MPU6050_RA_PWR_MGMT_2, self.MPU6050_PWR2_LP_WAKE_CTRL_BIT, self.MPU6050_PWR2_LP_WAKE_CTRL_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_LP_WAKE_CTRL)
         
     def setWakeFrequency(self, frequency):
-        self.i2c.writeBits(self.MPU6050_RA_PWR_MGMT_2, self.MPU6050_PWR2_LP_WAKE_CTRL_BIT, self.MPU6050_PWR2_LP_WAKE_CTRL_LENGTH, frequency)
+        self.i2c.writeField(self.MPU6050_FIELD_LP_WAKE_CTRL, frequency)
         
     def getStandbyXAccelEnabled(self):
         return self.i2c.readBit(self.MPU6050_RA_PWR_MGMT_2, self.MPU6050_PWR2_STBY_XA_BIT)
@@ -1231,22 +1319,43 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_PWR_MGMT_2, self.MPU6050_PWR2_STBY_ZG_BIT, enabled)
 
     def getFIFOCount(self):
-        return self.i2c.readU16(self.MPU6050_RA_FIFO_COUNTH)
+        # FIFO access is latency critical, it jumps the bus queue
+        with self.i2c.transaction(PRIORITY_HIGH):
+            return self.i2c.readU16(self.MPU6050_RA_FIFO_COUNTH)
 
     def getFIFOByte(self):
-        return self.i2c.readU8(self.MPU6050_RA_FIFO_R_W)
+        with self.i2c.transaction(PRIORITY_HIGH):
+            return self.i2c.readU8(self.MPU6050_RA_FIFO_R_W)
     
     def getFIFOBytes(self,length):
-        return self.i2c.readBytes(self.MPU6050_RA_FIFO_R_W, length)
+        with self.i2c.transaction(PRIORITY_HIGH):
+            return self.i2c.readBytes(self.MPU6050_RA_FIFO_R_W, length)
+
+    def getFIFOBytesInto(self, buffer, offset = 0, length = None):
+        # getFIFOBytes filling a caller owned buffer, a drain loop can reuse
+        # one bytearray(packetSize) instead of getting a new list per packet
+        with self.i2c.transaction(PRIORITY_HIGH):
+            return self.i2c.readinto(self.MPU6050_RA_FIFO_R_W, buffer, offset, length, False)
 
     def setFIFOByte(self, data):
         self.i2c.write8(self.MPU6050_RA_FIFO_R_W, data)
 
+    # asyncio variants of the FIFO polling calls, run on the bus executor
+    
+    async def getIntStatusAsync(self):
+        return await getAsync(self.i2c).run(self.getIntStatus)
+    
+    async def getFIFOCountAsync(self):
+        return await getAsync(self.i2c).run(self.getFIFOCount)
+    
+    async def getFIFOBytesAsync(self, length):
+        return await getAsync(self.i2c).run(self.getFIFOBytes, length)
+
     def getDeviceID(self):
-        return self.i2c.readBits(self.MPU6050_RA_WHO_AM_I, self.MPU6050_WHO_AM_I_BIT, self.MPU6050_WHO_AM_I_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_WHO_AM_I)
 
     def setDeviceID(self, id):
-        self.i2c.writeBits(self.MPU6050_RA_WHO_AM_I, self.MPU6050_WHO_AM_I_BIT, self.MPU6050_WHO_AM_I_LENGTH, id)
+        self.i2c.writeField(self.MPU6050_FIELD_WHO_AM_I, id)
 
     def getOTPBankValid(self):
         result = self.i2c.readBit(self.MPU6050_RA_XG_OFFS_TC, self.MPU6050_TC_OTP_BNK_VLD_BIT)
@@ -1256,22 +1365,22 @@ class MPU6050:
         self.i2c.writeBit(self.MPU6050_RA_XG_OFFS_TC, self.MPU6050_TC_OTP_BNK_VLD_BIT, status)
 
     def getXGyroOffset(self):
-        return self.i2c.readBits(self.MPU6050_RA_XG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_XG_OFFS_TC)
     
     def setXGyroOffset(self, offset):
-        self.i2c.writeBits(self.MPU6050_RA_XG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH, offset)
+        self.i2c.writeField(self.MPU6050_FIELD_XG_OFFS_TC, offset)
 
     def getYGyroOffset(self):
-        return self.i2c.readBits(self.MPU6050_RA_YG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_YG_OFFS_TC)
     
     def setYGyroOffset(self, offset):
-        self.i2c.writeBits(self.MPU6050_RA_YG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH, offset)
+        self.i2c.writeField(self.MPU6050_FIELD_YG_OFFS_TC, offset)
 
     def getZGyroOffset(self):
-        return self.i2c.readBits(self.MPU6050_RA_ZG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH)
+        return self.i2c.readField(self.MPU6050_FIELD_ZG_OFFS_TC)
         
     def setZGyroOffset(self, offset):
-        self.i2c.writeBits(self.MPU6050_RA_ZG_OFFS_TC, self.MPU6050_TC_OFFSET_BIT, self.MPU6050_TC_OFFSET_LENGTH, offset)        
+        self.i2c.writeField(self.MPU6050_FIELD_ZG_OFFS_TC, offset)        
         
     def getXFineGain(self):
         return self.i2c.readU8(self.MPU6050_RA_X_FINE_GAIN)
@@ -1292,25 +1401,25 @@ class MPU6050:
         self.i2c.write8(self.MPU6050_RA_Z_FINE_GAIN, gain)
     
     def getXAccelOffset(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_XA_OFFS_H)
 
     def setXAccelOffset(self, offset):
         pass
 
     def getYAccelOffset(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_YA_OFFS_H)
 
     def setYAccelOffset(self, offset):
         pass
 
     def getZAccelOffset(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_ZA_OFFS_H)
 
     def setZAccelOffset(self, offset):
         pass
 
     def getXGyroOffsetUser(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_XG_OFFS_USRH)
         
     def setXGyroOffsetUser(self, value):
         self.i2c.write8(self.MPU6050_RA_XG_OFFS_USRH, value >> 8)
@@ -1318,7 +1427,7 @@ class MPU6050:
         return True        
         
     def getYGyroOffsetUser(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_YG_OFFS_USRH)
         
     def setYGyroOffsetUser(self, value):
         self.i2c.write8(self.MPU6050_RA_YG_OFFS_USRH, value >> 8)
@@ -1326,7 +1435,7 @@ class MPU6050:
         return True        
         
     def getZGyroOffsetUser(self):
-        pass
+        return self.i2c.readS16(self.MPU6050_RA_ZG_OFFS_USRH)
         
     def setZGyroOffsetUser(self, value):
         self.i2c.write8(self.MPU6050_RA_ZG_OFFS_USRH, value >> 8)
@@ -1403,38 +1512,48 @@ class MPU6050:
         pass
 
     def writeMemoryBlock(self, data, dataSize, bank = 0, address = 0, verify = False):
+        # bank and start address are shared state, keep the bus for the whole upload
+        with self.i2c.transaction():
+            self.writeMemoryChunks(data, dataSize, bank, address, verify)
+            
+    def writeMemoryChunks(self, data, dataSize, bank, address, verify):
         self.setMemoryBank(bank)
         self.setMemoryStartAddress(address)
         
         i = 0
-        while i < dataSize:  
-            self.i2c.write8(self.MPU6050_RA_MEM_R_W, data[i])
+        while i < dataSize:
+            # DMP memory is written in chunks of at most MPU6050_DMP_MEMORY_CHUNK_SIZE
+            # bytes (less if the bus can't take that many), never past the end
+            # of the current bank
+            chunkSize = min(dataSize - i, self.MPU6050_DMP_MEMORY_CHUNK_SIZE, self.i2c.blockMax, self.MPU6050_DMP_MEMORY_BANK_SIZE - address)
+            chunk = list(data[i:i + chunkSize])
+            
+            self.i2c.writeList(self.MPU6050_RA_MEM_R_W, chunk)
 
             # Verify
             if verify:
                 self.setMemoryBank(bank)
                 self.setMemoryStartAddress(address)
-                result = self.i2c.readU8(self.MPU6050_RA_MEM_R_W)
+                result = self.i2c.readBytes(self.MPU6050_RA_MEM_R_W, chunkSize)
                 
-                if result != data[i]:
-                    print(data[i]),
+                if result != chunk:
+                    print(chunk),
                     print(result),
                     print(address)
                     
+            # increase byte index
+            i += chunkSize
+            address += chunkSize
+            
             # reset adress to 0 after reaching 255
-            if address == 255:
+            if address == self.MPU6050_DMP_MEMORY_BANK_SIZE:
                 address = 0
                 bank += 1
 
                 self.setMemoryBank(bank)
-            else:
-                address += 1
             
             self.setMemoryStartAddress(address)
 
-            # increase byte index
-            i += 1
-
 
     def writeDMPConfigurationSet(self, data, dataSize, bank = 0, address = 0, verify = False):
         # config set data is a long string of blocks with the following structure:
@@ -1489,24 +1608,15 @@ class MPU6050:
         pass
     
     def dmpGetQuaternion(self, packet):
-        # We are dealing with signed bytes
-        if packet[0] > 127:
-            packet[0] -= 256
-
-        if packet[4] > 127:
-            packet[4] -= 256
-            
-        if packet[8] > 127:
-            packet[8] -= 256            
-          
-        if packet[12] > 127:
-            packet[12] -= 256          
+        # The quaternion is the high half of four big-endian int32 values at
+        # the start of the packet, packet itself is left as it is
+        w, x, y, z = unpack(self.MPU6050_DMP_QUATERNION_FORMAT, packet)
 
         data = {
-            'w' : ((packet[0] << 8) + packet[1]) / 16384.0,  
-            'x' : ((packet[4] << 8) + packet[5]) / 16384.0,
-            'y' : ((packet[8] << 8) + packet[9]) / 16384.0,
-            'z' : ((packet[12] << 8) + packet[13]) / 16384.0}        
+            'w' : w / 16384.0,  
+            'x' : x / 16384.0,
+            'y' : y / 16384.0,
+            'z' : z / 16384.0}        
         
         return data    
     
@@ -1556,12 +1666,13 @@ class MPU6050:
         self.setSleepEnabled(False)
 
         # get MPU hardware revision
-        self.setMemoryBank(0x10, True, True) # Selecting user bank 16
-        self.setMemoryStartAddress(0x06) # Selecting memory byte 6
-        hwRevision = self.readMemoryByte() # Checking hardware revision
-        #print('Revision @ user[16][6] ='),
-        #print(hex(hwRevision))
-        self.setMemoryBank(0, False, False) # Resetting memory bank selection to 0
+        with self.i2c.transaction():
+            self.setMemoryBank(0x10, True, True) # Selecting user bank 16
+            self.setMemoryStartAddress(0x06) # Selecting memory byte 6
+            hwRevision = self.readMemoryByte() # Checking hardware revision
+            #print('Revision @ user[16][6] ='),
+            #print(hex(hwRevision))
+            self.setMemoryBank(0, False, False) # Resetting memory bank selection to 0
         
         # get X/Y/Z gyro offsets
         xgOffset = self.getXGyroOffset()
@@ -1609,10 +1720,11 @@ class MPU6050:
         #self.setYGyroOffset(ygOffset);
         #self.setZGyroOffset(zgOffset);   
         
-        # Setting X/Y/Z gyro user offsets to zero
-        self.setXGyroOffsetUser(0)
-        self.setYGyroOffsetUser(0)
-        self.setZGyroOffsetUser(0)  
+        # Setting X/Y/Z gyro user offsets to zero (one block write)
+        with self.i2c.batch():
+            self.setXGyroOffsetUser(0)
+            self.setYGyroOffsetUser(0)
+            self.setZGyroOffsetUser(0)  
 
         # Writing final memory update 1/7 (function unknown)
         pos = 0
@@ -1733,4 +1845,6 @@ class MPU6050:
         
         # Resetting FIFO and clearing INT status one last time
         self.resetFIFO()
-        self.getIntStatus()
\ No newline at end of file
+        self.getIntStatus()
+
+registerDriver(MPU6050, (MPU6050.MPU6050_ADDRESS_AD0_LOW, MPU6050.MPU6050_ADDRESS_AD0_HIGH))
@@ -9,6 +9,7 @@ pass
 
 # Custom Imports
 from pycomms import PyComms
+from busscan import registerDriver
 
 # ============================================================================
 # Adafruit PCA9685 16-Channel PWM Servo Driver (slightly modified)
@@ -21,6 +22,7 @@ class PCA9685():
     __SUBADR1            = 0x02
     __SUBADR2            = 0x03
     __SUBADR3            = 0x04
+    __ALLCALLADR         = 0x05
     __MODE1              = 0x00
     __PRESCALE           = 0xFE
     __LED0_ON_L          = 0x06
@@ -31,11 +33,24 @@ class PCA9685():
     __ALLLED_ON_H        = 0xFB
     __ALLLED_OFF_L       = 0xFC
     __ALLLED_OFF_H       = 0xFD
+    __MODE1_AI           = 0x20   # register auto increment
 
-    def __init__(self, address = 0x40):
-        self.i2c = PyComms(address)
+    def __init__(self, address = 0x40, bus = None):
+        self.i2c = PyComms(address, bus)
         self.address = address
-        self.i2c.write8(self.__MODE1, 0x00)
+        # auto increment lets setPWM go out as a single block write
+        self.i2c.write8(self.__MODE1, self.__MODE1_AI)
+
+    @classmethod
+    def detect(cls, i2c):
+        # busscan check, there is no id register. The sub and all call
+        # address registers hold 7-bit addresses (bit 0 always reads 0) and
+        # the prescaler can't go below 3, a plain register file rarely looks
+        # like that but it's a heuristic, so the driver registers as fallback
+        for reg in (cls.__SUBADR1, cls.__SUBADR2, cls.__SUBADR3, cls.__ALLCALLADR):
+            if i2c.readU8(reg) & 0x01:
+                return False
+        return i2c.readU8(cls.__PRESCALE) >= 3
 
     def setPWMFreq(self, freq):
         # Sets the PWM frequency"
@@ -55,7 +70,11 @@ class PCA9685():
 
     def setPWM(self, channel, on, off):
         # Sets a single PWM channel
-        self.i2c.write8(self.__LED0_ON_L + 4 * channel, on & 0xFF)
-        self.i2c.write8(self.__LED0_ON_H + 4 * channel, on >> 8)
-        self.i2c.write8(self.__LED0_OFF_L + 4 * channel, off & 0xFF)
-        self.i2c.write8(self.__LED0_OFF_H + 4 * channel, off >> 8)
\ No newline at end of file
+        with self.i2c.batch():
+            self.i2c.write8(self.__LED0_ON_L + 4 * channel, on & 0xFF)
+            self.i2c.write8(self.__LED0_ON_H + 4 * channel, on >> 8)
+            self.i2c.write8(self.__LED0_OFF_L + 4 * channel, off & 0xFF)
+            self.i2c.write8(self.__LED0_OFF_H + 4 * channel, off >> 8)
+
+# 0x70 is the all call address every PCA9685 answers to by default
+registerDriver(PCA9685, [address for address in range(0x40, 0x80) if address != 0x70], fallback = True)
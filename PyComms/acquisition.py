@@ -0,0 +1,187 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import multiprocessing
+import struct
+import time
+from multiprocessing.connection import wait
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# AcquisitionManager one worker process per I2C bus
+# ===========================================================================
+
+# frames sent from a worker, the first byte tells what follows
+FRAME_SAMPLES = b'S'
+FRAME_ERROR = b'E'
+FRAME_DONE = b'D'
+
+# sample record: source id (H), value count (H), timestamp (d), then count doubles
+SAMPLE = struct.Struct('<HHd')
+VALUE = struct.Struct('<d')
+
+def packSample(buf, sourceId, timestamp, values):
+    buf += SAMPLE.pack(sourceId, len(values), timestamp)
+    buf += struct.pack('<%dd' % len(values), *values)
+
+def busWorker(busNumber, sources, conn, stop, batchSize, flushInterval):
+    # Worker process body. Builds every source of the bus, then polls each
+    # one at its period and sends the samples back in batches as raw bytes,
+    # so nothing gets pickled on the way.
+    try:
+        samplers = []
+        for sourceId, (name, factory, period) in enumerate(sources):
+            samplers.append([sourceId, name, factory(busNumber), period, 0.0])
+    except Exception as error:
+        conn.send_bytes(FRAME_ERROR + ('setup of bus %d failed: %r' % (busNumber, error)).encode('utf-8'))
+        conn.send_bytes(FRAME_DONE)
+        conn.close()
+        return
+
+    buf = bytearray(FRAME_SAMPLES)
+    count = 0
+    lastFlush = time.time()
+
+    while not stop.is_set():
+        now = time.time()
+        nextDue = now + flushInterval
+        for sampler in samplers:
+            sourceId, name, sample, period, due = sampler
+            if now >= due:
+                # keep the schedule, but don't try to catch up on missed periods
+                sampler[4] = max(due + period, now)
+                try:
+                    values = sample()
+                except (IOError) as error:
+                    conn.send_bytes(FRAME_ERROR + ('%s on bus %d: %s' % (name, busNumber, error)).encode('utf-8'))
+                    values = None
+                if values is not None:
+                    packSample(buf, sourceId, now, values)
+                    count += 1
+            nextDue = min(nextDue, sampler[4])
+
+        if count and (count >= batchSize or now - lastFlush >= flushInterval):
+            conn.send_bytes(buf)
+            del buf[1:]
+            count = 0
+            lastFlush = now
+
+        delay = nextDue - time.time()
+        if delay > 0:
+            stop.wait(delay)
+
+    if count:
+        conn.send_bytes(buf)
+    conn.send_bytes(FRAME_DONE)
+    conn.close()
+
+class AcquisitionManager:
+    # Runs the devices of every I2C bus in a process of its own, so reading
+    # several adapters isn't limited by one interpreter lock.
+    #
+    # A source is a factory, called once inside the worker with the bus
+    # number, returning a function that takes one sample: a sequence of
+    # numbers, or None when there is nothing new. Factories must be module
+    # level functions (they get pickled to the worker), e.g.
+    #
+    #   def heading(bus):
+    #       mag = HMC5883L(bus = bus)
+    #       mag.initialize()
+    #       return lambda: mag.readAxes()
+    #
+    #   manager.addSource(1, 'heading', heading, 0.01)
+
+    def __init__(self, batchSize = 64, flushInterval = 0.01, context = None):
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.context = context or multiprocessing.get_context()
+        self.sources = {}
+        self.names = {}
+        self.workers = {}
+        self.errors = []
+        self.stopEvent = None
+        # frames are received into this buffer, grown when one doesn't fit
+        self.buffer = bytearray(4096)
+
+    def addSource(self, busNumber, name, factory, period):
+        # period is the time between samples in seconds
+        if self.workers:
+            raise RuntimeError('sources have to be added before start()')
+        self.sources.setdefault(busNumber, []).append((name, factory, period))
+        self.names.setdefault(busNumber, []).append(name)
+
+    def start(self):
+        self.stopEvent = self.context.Event()
+        for busNumber, sources in self.sources.items():
+            receiver, sender = self.context.Pipe(duplex = False)
+            process = self.context.Process(target = busWorker,
+                args = (busNumber, sources, sender, self.stopEvent, self.batchSize, self.flushInterval),
+                name = 'i2c-bus-%d' % busNumber, daemon = True)
+            process.start()
+            # only the worker writes to the pipe
+            sender.close()
+            self.workers[receiver] = (busNumber, process)
+
+    def stop(self, timeout = 1.0):
+        # Stops the workers, samples still in flight are dropped
+        if self.stopEvent is not None:
+            self.stopEvent.set()
+        for receiver, (busNumber, process) in list(self.workers.items()):
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+            receiver.close()
+        self.workers = {}
+
+    def receive(self, receiver):
+        while True:
+            try:
+                size = receiver.recv_bytes_into(self.buffer)
+                return memoryview(self.buffer)[:size]
+            except (multiprocessing.BufferTooShort) as error:
+                # the message is handed back in the exception
+                data = error.args[0]
+                self.buffer = bytearray(max(len(data), 2 * len(self.buffer)))
+                return memoryview(data)
+
+    def decode(self, busNumber, frame):
+        names = self.names[busNumber]
+        offset = 1
+        while offset < len(frame):
+            sourceId, count, timestamp = SAMPLE.unpack_from(frame, offset)
+            offset += SAMPLE.size
+            values = struct.unpack_from('<%dd' % count, frame, offset)
+            offset += count * VALUE.size
+            yield (busNumber, names[sourceId], timestamp, values)
+
+    def samples(self, timeout = None):
+        # Yields (bus number, source name, timestamp, values) as they arrive
+        # until every worker is done or nothing came in for timeout seconds.
+        # Errors reported by the workers are collected in self.errors.
+        while self.workers:
+            ready = wait(list(self.workers), timeout)
+            if not ready:
+                return
+
+            for receiver in ready:
+                busNumber, process = self.workers[receiver]
+                try:
+                    frame = self.receive(receiver)
+                except (EOFError):
+                    frame = FRAME_DONE
+
+                kind = bytes(frame[:1])
+                if kind == FRAME_SAMPLES:
+                    for sample in self.decode(busNumber, frame):
+                        yield sample
+                elif kind == FRAME_ERROR:
+                    self.errors.append((busNumber, bytes(frame[1:]).decode('utf-8')))
+                else:
+                    receiver.close()
+                    process.join()
+                    del self.workers[receiver]
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# AsyncPyComms asyncio front end for PyComms
+# ===========================================================================
+
+executors = {}
+executorsLock = threading.Lock()
+
+def getBusExecutor(bus):
+    # One single thread executor per bus, so bus I/O from coroutines never
+    # blocks the event loop and never needs more than one thread per adapter
+    with executorsLock:
+        entry = executors.get(id(bus))
+        if entry is None or entry[0] is not bus:
+            entry = (bus, ThreadPoolExecutor(max_workers = 1))
+            executors[id(bus)] = entry
+        return entry[1]
+
+class AsyncPyComms:
+    # Every PyComms method is available as a coroutine of the same name,
+    # e.g. await aio.readU8(reg), the call itself runs on the bus executor
+
+    def __init__(self, i2c, executor = None):
+        self.i2c = i2c
+        if executor is None:
+            executor = getBusExecutor(i2c.rawBus)
+        self.executor = executor
+
+    async def run(self, function, *args):
+        # Runs any blocking function (a whole driver method too) on the bus executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args))
+
+    def __getattr__(self, name):
+        method = getattr(self.i2c, name)
+
+        async def call(*args):
+            return await self.run(method, *args)
+
+        return call
+
+def getAsync(i2c):
+    # Returns the AsyncPyComms of a PyComms, created on first use
+    aio = getattr(i2c, 'asyncComms', None)
+    if aio is None:
+        aio = AsyncPyComms(i2c)
+        i2c.asyncComms = aio
+    return aio
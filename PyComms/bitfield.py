@@ -0,0 +1,43 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+pass
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# BitField register field descriptor
+# ===========================================================================
+
+class BitField:
+    # A field of bits inside one 8-bit register, described the same way as
+    # the readBits / writeBits arguments (bitStart is the highest bit).
+    # Mask and shift are worked out once, when the field is declared.
+    #
+    # 01101001 register value
+    # 76543210 bit numbers
+    #    xxx   BitField(reg, bitStart = 4, length = 3)
+    # 00011100 mask, shift = 2
+
+    __slots__ = ('reg', 'shift', 'mask', 'length')
+
+    def __init__(self, reg, bitStart, length = 1):
+        self.reg = reg
+        self.length = length
+        self.shift = bitStart - length + 1
+        self.mask = ((1 << length) - 1) << self.shift
+
+    def decode(self, value):
+        # Field value out of a register value
+        return (value & self.mask) >> self.shift
+
+    def encode(self, current, data):
+        # Register value with the field replaced by data
+        return (current & ~self.mask) | ((data << self.shift) & self.mask)
+
+    def __repr__(self):
+        return 'BitField(0x%02X, %d, %d)' % (self.reg, self.shift + self.length - 1, self.length)
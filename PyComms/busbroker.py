@@ -0,0 +1,479 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import collections
+import errno
+import itertools
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+# External Imports
+pass
+
+# Custom Imports
+from i2cbus import I2CBus
+from busrecorder import OP_READ_BYTE, OP_WRITE_BYTE, OP_READ_BLOCK, OP_WRITE_BLOCK
+
+# ===========================================================================
+# BusBroker one process owning a bus, BrokerBus client backend
+# ===========================================================================
+
+# Framing, all little-endian. Every frame starts with the length of what
+# follows the length field, the request id and the kind.
+#   request  BATCH   op count (H), then op (B), address (B), reg (B),
+#                    length (H) and the data of write ops, per op
+#            DEVICE_LOCK / DEVICE_UNLOCK  address (B)
+#            LOCK / UNLOCK / STATS  nothing else
+#   response errno of the failed op or 0 (B), BATCH adds the number of ops
+#            done (H) and the data of the reads among them, STATS is JSON
+FRAME = struct.Struct('<IIB')
+COUNT = struct.Struct('<H')
+OP = struct.Struct('<BBBH')
+STATUS = struct.Struct('<B')
+DEVICE = struct.Struct('<B')
+
+KIND_BATCH = 1
+KIND_LOCK = 2
+KIND_UNLOCK = 3
+KIND_STATS = 4
+KIND_DEVICE_LOCK = 5
+KIND_DEVICE_UNLOCK = 6
+
+READ_OPS = (OP_READ_BYTE, OP_READ_BLOCK)
+
+# kinds nobody waits for the response of
+PIPELINED_KINDS = (KIND_LOCK, KIND_UNLOCK, KIND_DEVICE_LOCK, KIND_DEVICE_UNLOCK)
+
+def receiveExactly(conn, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return bytes(data)
+
+def receiveFrame(conn):
+    # returns (request id, kind, body)
+    length, requestId, kind = FRAME.unpack(receiveExactly(conn, FRAME.size))
+    return requestId, kind, receiveExactly(conn, length - FRAME.size + 4)
+
+def packFrame(requestId, kind, body):
+    return FRAME.pack(len(body) + FRAME.size - 4, requestId, kind) + body
+
+def requestAddresses(kind, body):
+    # the device addresses a request touches
+    if kind == KIND_DEVICE_LOCK:
+        return frozenset(DEVICE.unpack_from(body, 0))
+    if kind != KIND_BATCH:
+        return frozenset()
+
+    addresses = set()
+    count = COUNT.unpack_from(body, 0)[0]
+    offset = COUNT.size
+    for i in range(count):
+        op, address, reg, length = OP.unpack_from(body, offset)
+        offset += OP.size
+        if op not in READ_OPS:
+            offset += length
+        addresses.add(address)
+    return frozenset(addresses)
+
+class BrokerClient:
+    # one connected process, as the broker sees it
+
+    def __init__(self, conn, number):
+        self.conn = conn
+        self.number = number
+        self.sendLock = threading.Lock()
+        self.closed = False
+        self.requests = 0
+
+    def send(self, data):
+        with self.sendLock:
+            if not self.closed:
+                try:
+                    self.conn.sendall(data)
+                except (socket.error):
+                    self.closed = True
+
+class BusBroker:
+    # Owns bus and serves the requests of every client on a Unix socket,
+    # one at a time in arrival order. A batch is executed without anything
+    # in between, and a client that sent LOCK is the only one served until
+    # it sends UNLOCK (or disconnects), so multi step register sequences of
+    # different processes never interleave. DEVICE_LOCK does the same for
+    # one address only, for sequences with a wait in between (a BMP085
+    # conversion): requests of other clients to that device wait, the rest
+    # of the bus keeps being served. Clients don't have to wait for a
+    # response before sending the next request.
+
+    def __init__(self, bus, path):
+        self.bus = bus
+        self.path = path
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.owner = None
+        # address -> client holding the device lock
+        self.deviceOwners = {}
+        self.clients = []
+        self.numbers = itertools.count(1)
+        self.server = None
+        self.running = False
+        self.threads = []
+        self.resetStats()
+
+    def resetStats(self):
+        self.batches = 0
+        self.ops = 0
+        self.errors = 0
+        self.maxDepth = 0
+        self.waitTime = 0.0
+
+    def queueDepth(self):
+        with self.cond:
+            return len(self.pending)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'blockMax' : getattr(self.bus, 'blockMax', I2CBus.blockMax),
+                'clients' : len(self.clients),
+                'queueDepth' : len(self.pending),
+                'maxQueueDepth' : self.maxDepth,
+                'batches' : self.batches,
+                'ops' : self.ops,
+                'errors' : self.errors,
+                'waitTime' : self.waitTime,
+                'locked' : self.owner is not None,
+                'lockedDevices' : sorted(self.deviceOwners)}
+
+    def start(self):
+        if os.path.exists(self.path):
+            # stale socket of a broker that didn't shut down cleanly
+            os.unlink(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(8)
+        self.running = True
+
+        for target in (self.acceptLoop, self.executeLoop):
+            thread = threading.Thread(target = target, name = 'busbroker-' + target.__name__)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def serveForever(self):
+        self.start()
+        try:
+            while self.running:
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    def stop(self):
+        with self.cond:
+            if not self.running:
+                return
+            self.running = False
+            self.cond.notify_all()
+        try:
+            # unblocks accept()
+            self.server.shutdown(socket.SHUT_RDWR)
+        except (socket.error):
+            pass
+        self.server.close()
+        for client in list(self.clients):
+            client.closed = True
+            client.conn.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def acceptLoop(self):
+        while self.running:
+            try:
+                conn, address = self.server.accept()
+            except (socket.error):
+                break
+            client = BrokerClient(conn, next(self.numbers))
+            with self.cond:
+                self.clients.append(client)
+            thread = threading.Thread(target = self.clientLoop, args = (client,), name = 'busbroker-client-%d' % client.number)
+            thread.daemon = True
+            thread.start()
+
+    def clientLoop(self, client):
+        try:
+            while self.running:
+                requestId, kind, body = receiveFrame(client.conn)
+                with self.cond:
+                    self.pending.append((client, requestId, kind, body, time.time(), requestAddresses(kind, body)))
+                    self.maxDepth = max(self.maxDepth, len(self.pending))
+                    self.cond.notify_all()
+        except (EOFError, socket.error):
+            pass
+
+        with self.cond:
+            client.closed = True
+            if client in self.clients:
+                self.clients.remove(client)
+            if self.owner is client:
+                self.owner = None
+            for address in [address for address, owner in self.deviceOwners.items() if owner is client]:
+                del self.deviceOwners[address]
+            self.pending = collections.deque(entry for entry in self.pending if entry[0] is not client)
+            self.cond.notify_all()
+        client.conn.close()
+
+    def deviceHolder(self, client, addresses):
+        # the other client holding the device lock of one of addresses, or None
+        for address in addresses:
+            holder = self.deviceOwners.get(address)
+            if holder is not None and holder is not client:
+                return holder
+        return None
+
+    def nextRequest(self):
+        # The oldest request that may run. While somebody holds the bus only
+        # its requests run, or, when it waits for a device another client
+        # holds, that client's (its sequence has to end first). A request
+        # touching a device held by another client waits, and so does
+        # everything its client sent after it.
+        served = self.owner
+        if served is not None:
+            for entry in self.pending:
+                if entry[0] is served:
+                    served = self.deviceHolder(served, entry[5]) or served
+                    break
+
+        waiting = set()
+        for entry in self.pending:
+            client = entry[0]
+            if client in waiting or (served is not None and client is not served):
+                continue
+            if self.deviceHolder(client, entry[5]) is not None or (entry[2] == KIND_LOCK and self.owner not in (None, client)):
+                waiting.add(client)
+                continue
+            self.pending.remove(entry)
+            return entry
+        return None
+
+    def executeLoop(self):
+        while True:
+            with self.cond:
+                entry = self.nextRequest()
+                while entry is None and self.running:
+                    self.cond.wait()
+                    entry = self.nextRequest()
+                if entry is None:
+                    return
+
+                client, requestId, kind, body, queued, addresses = entry
+                self.waitTime += time.time() - queued
+                client.requests += 1
+                if kind == KIND_LOCK:
+                    self.owner = client
+                elif kind == KIND_UNLOCK and self.owner is client:
+                    self.owner = None
+                elif kind == KIND_DEVICE_LOCK:
+                    self.deviceOwners.update(dict.fromkeys(addresses, client))
+                elif kind == KIND_DEVICE_UNLOCK:
+                    address = DEVICE.unpack_from(body, 0)[0]
+                    if self.deviceOwners.get(address) is client:
+                        del self.deviceOwners[address]
+
+            if kind == KIND_BATCH:
+                response = self.executeBatch(body)
+            elif kind == KIND_STATS:
+                response = STATUS.pack(0) + json.dumps(self.stats()).encode('utf-8')
+            elif kind in PIPELINED_KINDS:
+                response = STATUS.pack(0)
+            else:
+                response = STATUS.pack(errno.EINVAL)
+            client.send(packFrame(requestId, kind, response))
+
+    def executeBatch(self, body):
+        count = COUNT.unpack_from(body, 0)[0]
+        offset = COUNT.size
+        data = bytearray()
+        done = 0
+        status = 0
+
+        while done < count:
+            op, address, reg, length = OP.unpack_from(body, offset)
+            offset += OP.size
+            if op in READ_OPS:
+                payload = None
+            else:
+                payload = list(bytearray(body[offset:offset + length]))
+                offset += length
+
+            try:
+                if op == OP_READ_BYTE:
+                    data.append(self.bus.read_byte_data(address, reg))
+                elif op == OP_READ_BLOCK:
+                    data += bytearray(self.bus.read_i2c_block_data(address, reg, length))
+                elif op == OP_WRITE_BYTE:
+                    self.bus.write_byte_data(address, reg, payload[0])
+                elif op == OP_WRITE_BLOCK:
+                    self.bus.write_i2c_block_data(address, reg, payload)
+                else:
+                    raise IOError(errno.EINVAL, 'unknown op %d' % op)
+            except (IOError) as error:
+                status = (error.errno or errno.EIO) & 0xFF
+                break
+            done += 1
+
+        with self.cond:
+            self.batches += 1
+            self.ops += done
+            if status:
+                self.errors += 1
+        return STATUS.pack(status) + COUNT.pack(done) + bytes(data)
+
+class BrokerBus(I2CBus):
+    # Client backend, PyComms(address, BrokerBus(path)) talks to the device
+    # through the broker. PyComms.transaction() (and with it batch(),
+    # snapshot(), read-modify-writes like writeBit and multi transfer reads)
+    # holds the broker lock too, so a register sequence of this process is
+    # never interleaved with another one's. PyComms.deviceSequence() holds
+    # the device lock through beginDevice / endDevice instead, for
+    # sequences that wait in between like the BMP085 conversions.
+
+    def __init__(self, path):
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.conn.connect(path)
+        self.mutex = threading.RLock()
+        self.requestIds = itertools.count(1)
+        # requests sent whose response hasn't been read yet, in order
+        self.outstanding = collections.deque()
+        self.responses = {}
+        self.sequenceDepth = 0
+        # address -> nesting depth of beginDevice
+        self.deviceDepths = {}
+        self.blockMax = self.stats()['blockMax']
+
+    def send(self, kind, body = b''):
+        with self.mutex:
+            requestId = next(self.requestIds)
+            self.conn.sendall(packFrame(requestId, kind, body))
+            self.outstanding.append(requestId)
+            return requestId
+
+    def receive(self, requestId):
+        # Reads responses, in order, up to the one of requestId
+        with self.mutex:
+            while requestId not in self.responses:
+                responseId, kind, body = receiveFrame(self.conn)
+                self.outstanding.popleft()
+                if kind in PIPELINED_KINDS:
+                    # pipelined, nobody waits for these
+                    if responseId != requestId:
+                        continue
+                self.responses[responseId] = body
+            return self.responses.pop(requestId)
+
+    def execute(self, ops):
+        # Runs [(op, address, reg, length or data), ...] as one atomic batch,
+        # returns the data of every op (a list for reads, None for writes).
+        # Raises IOError with the errno of the first op that failed, the
+        # ones after it aren't executed.
+        body = bytearray(COUNT.pack(len(ops)))
+        for op, address, reg, value in ops:
+            if op in READ_OPS:
+                body += OP.pack(op, address, reg, value)
+            else:
+                body += OP.pack(op, address, reg, len(value)) + bytes(bytearray(value))
+
+        with self.mutex:
+            response = self.receive(self.send(KIND_BATCH, bytes(body)))
+
+        status = STATUS.unpack_from(response, 0)[0]
+        done = COUNT.unpack_from(response, STATUS.size)[0]
+        if status:
+            raise IOError(status, 'op %d of the batch failed: %s' % (done, os.strerror(status)))
+
+        results = []
+        offset = STATUS.size + COUNT.size
+        for op, address, reg, value in ops:
+            if op in READ_OPS:
+                results.append(list(bytearray(response[offset:offset + value])))
+                offset += value
+            else:
+                results.append(None)
+        return results
+
+    def beginSequence(self):
+        # called by PyComms.transaction, the lock request goes out with the
+        # next request instead of costing a round trip of its own
+        with self.mutex:
+            self.sequenceDepth += 1
+            if self.sequenceDepth == 1:
+                self.send(KIND_LOCK)
+
+    def endSequence(self):
+        with self.mutex:
+            self.sequenceDepth -= 1
+            if self.sequenceDepth == 0:
+                self.send(KIND_UNLOCK)
+
+    def beginDevice(self, address):
+        # called by PyComms.deviceSequence, pipelined like beginSequence
+        with self.mutex:
+            depth = self.deviceDepths.get(address, 0)
+            if depth == 0:
+                self.send(KIND_DEVICE_LOCK, DEVICE.pack(address))
+            self.deviceDepths[address] = depth + 1
+
+    def endDevice(self, address):
+        with self.mutex:
+            depth = self.deviceDepths.pop(address) - 1
+            if depth:
+                self.deviceDepths[address] = depth
+            else:
+                self.send(KIND_DEVICE_UNLOCK, DEVICE.pack(address))
+
+    def stats(self):
+        # broker wide numbers including the queue depth
+        with self.mutex:
+            response = self.receive(self.send(KIND_STATS))
+        return json.loads(response[STATUS.size:].decode('utf-8'))
+
+    def read_byte_data(self, address, reg):
+        return self.execute([(OP_READ_BYTE, address, reg, 1)])[0][0]
+
+    def write_byte_data(self, address, reg, value):
+        self.execute([(OP_WRITE_BYTE, address, reg, [value])])
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        return self.execute([(OP_READ_BLOCK, address, reg, length)])[0]
+
+    def write_i2c_block_data(self, address, reg, data):
+        self.execute([(OP_WRITE_BLOCK, address, reg, data)])
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+def main(argv):
+    # busbroker.py <bus number> <socket path>
+    if len(argv) != 3:
+        sys.stderr.write('usage: %s <bus number> <socket path>\n' % argv[0])
+        return 2
+
+    from pycomms import openBus
+    broker = BusBroker(openBus(int(argv[1])), argv[2])
+    try:
+        broker.serveForever()
+    except (KeyboardInterrupt):
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import heapq
+import itertools
+import threading
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# BusLock reentrant per-bus lock with priority classes
+# ===========================================================================
+
+# priority classes, lower value is served first
+PRIORITY_HIGH   = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW    = 2
+
+class BusLock:
+    # Reentrant lock. When the bus gets free the waiting thread with the
+    # highest priority class gets it, threads within a class are served
+    # in the order they started waiting.
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.owner = None
+        self.depth = 0
+        self.waiting = []
+        self.tickets = itertools.count()
+
+    def acquire(self, priority = PRIORITY_NORMAL):
+        me = threading.current_thread()
+        with self.cond:
+            if self.owner is me:
+                self.depth += 1
+                return
+
+            if self.owner is None and not self.waiting:
+                self.owner = me
+                self.depth = 1
+                return
+
+            ticket = (priority, next(self.tickets))
+            heapq.heappush(self.waiting, ticket)
+            while self.owner is not None or self.waiting[0] != ticket:
+                self.cond.wait()
+
+            heapq.heappop(self.waiting)
+            self.owner = me
+            self.depth = 1
+
+    def release(self):
+        with self.cond:
+            if self.owner is not threading.current_thread():
+                raise RuntimeError('BusLock released by a thread that does not hold it')
+
+            self.depth -= 1
+            if self.depth == 0:
+                self.owner = None
+                if self.waiting:
+                    self.cond.notify_all()
+
+    def queueDepth(self):
+        # number of threads waiting for the bus
+        with self.cond:
+            return len(self.waiting)
+
+busLocks = {}
+busLocksLock = threading.Lock()
+
+def getBusLock(bus):
+    # Returns the BusLock shared by every PyComms talking over bus
+    with busLocksLock:
+        entry = busLocks.get(id(bus))
+        if entry is None or entry[0] is not bus:
+            # keep a reference to bus so its id can't be reused
+            entry = (bus, BusLock())
+            busLocks[id(bus)] = entry
+        return entry[1]
+
+def dropBusLock(bus):
+    # Forgets the lock of a bus that has been closed
+    with busLocksLock:
+        entry = busLocks.get(id(bus))
+        if entry is not None and entry[0] is bus:
+            del busLocks[id(bus)]
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import struct
+import threading
+import time
+
+# External Imports
+pass
+
+# Custom Imports
+from i2cbus import I2CBus
+
+# ===========================================================================
+# BusRecorder traffic capture and ReplayBus playback
+# ===========================================================================
+
+# File layout, all little-endian:
+#   header  'PYCR', version (B), wall clock start time (d)
+#   records op (B), address (B), reg (B), errno (B, 0 = ok), length (H),
+#           microseconds since the previous record (I), payload
+# The payload is the data written for writes and the data returned for
+# successful reads, failed reads carry none. length is the transfer length
+# (requested length for reads) either way.
+
+MAGIC = b'PYCR'
+VERSION = 1
+HEADER = struct.Struct('<4sBd')
+RECORD = struct.Struct('<BBBBHI')
+
+OP_READ_BYTE = 1
+OP_WRITE_BYTE = 2
+OP_READ_BLOCK = 3
+OP_WRITE_BLOCK = 4
+
+OP_NAMES = {
+    OP_READ_BYTE : 'read_byte_data',
+    OP_WRITE_BYTE : 'write_byte_data',
+    OP_READ_BLOCK : 'read_i2c_block_data',
+    OP_WRITE_BLOCK : 'write_i2c_block_data'}
+
+class ReplayError(ValueError):
+    # The code under replay asked for a transfer the recording doesn't have next
+    pass
+
+class BusRecorder:
+    # Appends transfers to a recording. target is a path or a binary file
+    # object, one recorder can be shared by every device of a rig so the
+    # file keeps the real order of transfers on the bus.
+
+    def __init__(self, target, clock = time.perf_counter):
+        if isinstance(target, str):
+            self.file = open(target, 'wb')
+            self.ownsFile = True
+        else:
+            self.file = target
+            self.ownsFile = False
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.last = clock()
+        self.count = 0
+        self.file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+
+    def record(self, op, address, reg, error, length, payload = b''):
+        with self.lock:
+            now = self.clock()
+            delta = min(int((now - self.last) * 1e6), 0xFFFFFFFF)
+            self.last = now
+            self.file.write(RECORD.pack(op, address, reg, error & 0xFF, length, delta))
+            if payload:
+                self.file.write(bytes(bytearray(payload)))
+            self.count += 1
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.ownsFile:
+                self.file.close()
+            else:
+                self.file.flush()
+
+class RecordingBus(I2CBus):
+    # Bus wrapper that hands every transfer to a BusRecorder, PyComms only
+    # puts it in place while recording (see PyComms.startRecording)
+
+    def __init__(self, bus, recorder):
+        self.bus = bus
+        self.recorder = recorder
+        self.blockMax = getattr(bus, 'blockMax', I2CBus.blockMax)
+
+    def read_byte_data(self, address, reg):
+        try:
+            value = self.bus.read_byte_data(address, reg)
+        except (IOError) as error:
+            self.recorder.record(OP_READ_BYTE, address, reg, error.errno or 0xFF, 1)
+            raise
+        self.recorder.record(OP_READ_BYTE, address, reg, 0, 1, [value])
+        return value
+
+    def write_byte_data(self, address, reg, value):
+        try:
+            self.bus.write_byte_data(address, reg, value)
+        except (IOError) as error:
+            self.recorder.record(OP_WRITE_BYTE, address, reg, error.errno or 0xFF, 1, [value])
+            raise
+        self.recorder.record(OP_WRITE_BYTE, address, reg, 0, 1, [value])
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        try:
+            data = self.bus.read_i2c_block_data(address, reg, length)
+        except (IOError) as error:
+            self.recorder.record(OP_READ_BLOCK, address, reg, error.errno or 0xFF, length)
+            raise
+        self.recorder.record(OP_READ_BLOCK, address, reg, 0, length, data)
+        return data
+
+    def write_i2c_block_data(self, address, reg, data):
+        try:
+            self.bus.write_i2c_block_data(address, reg, data)
+        except (IOError) as error:
+            self.recorder.record(OP_WRITE_BLOCK, address, reg, error.errno or 0xFF, len(data), data)
+            raise
+        self.recorder.record(OP_WRITE_BLOCK, address, reg, 0, len(data), data)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        # anything else the wrapped bus offers goes through unrecorded
+        return getattr(self.bus, name)
+
+def readRecording(source):
+    # Returns (start time, records) of a recording, source is a path or a
+    # binary file object. Each record is a tuple
+    # (seconds since start, op, address, reg, errno, length, payload bytes)
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            raw = f.read()
+    else:
+        raw = source.read()
+
+    view = memoryview(raw)
+    if len(raw) < HEADER.size:
+        raise ReplayError('not a bus recording')
+    magic, version, started = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ReplayError('not a version %d bus recording' % VERSION)
+
+    records = []
+    offset = HEADER.size
+    elapsed = 0.0
+    while offset + RECORD.size <= len(raw):
+        op, address, reg, error, length, delta = RECORD.unpack_from(view, offset)
+        offset += RECORD.size
+        elapsed += delta / 1e6
+
+        if op in (OP_WRITE_BYTE, OP_WRITE_BLOCK) or not error:
+            payload = bytes(view[offset:offset + length])
+            offset += length
+        else:
+            payload = b''
+
+        records.append((elapsed, op, address, reg, error, length, payload))
+
+    return started, records
+
+class ReplayBus(I2CBus):
+    # Bus backend that answers from a recording. Transfers have to come in
+    # the recorded order, reads return the recorded data, recorded errors
+    # are raised again and anything else raises ReplayError. Written data
+    # is compared too unless checkWrites is off. With realtime set the
+    # recorded gaps between transfers are slept, otherwise replay runs as
+    # fast as the code under test can go.
+
+    def __init__(self, source, blockMax = 32, checkWrites = True, realtime = False, sleep = time.sleep, clock = time.perf_counter):
+        self.started, self.records = readRecording(source)
+        self.blockMax = blockMax
+        self.checkWrites = checkWrites
+        self.realtime = realtime
+        self.sleep = sleep
+        self.clock = clock
+        self.position = 0
+        self.lock = threading.Lock()
+        self.replayStart = None
+
+    def remaining(self):
+        # number of recorded transfers not replayed yet
+        return len(self.records) - self.position
+
+    def rewind(self):
+        with self.lock:
+            self.position = 0
+            self.replayStart = None
+
+    def next(self, op, address, reg, length, data = None):
+        with self.lock:
+            if self.position >= len(self.records):
+                raise ReplayError('recording exhausted at %s of register 0x%02X on device 0x%02X' % (OP_NAMES[op], reg, address))
+
+            elapsed, rop, raddress, rreg, error, rlength, payload = self.records[self.position]
+            if (rop, raddress, rreg, rlength) != (op, address, reg, length):
+                raise ReplayError('transfer %d: expected %s of %d byte(s) at register 0x%02X on device 0x%02X, got %s of %d byte(s) at register 0x%02X on device 0x%02X' % (
+                    self.position, OP_NAMES[rop], rlength, rreg, raddress, OP_NAMES[op], length, reg, address))
+            if data is not None and self.checkWrites and bytes(bytearray(data)) != payload:
+                raise ReplayError('transfer %d: written data differs from the recording at register 0x%02X on device 0x%02X' % (self.position, reg, address))
+            self.position += 1
+
+            if self.realtime:
+                if self.replayStart is None:
+                    self.replayStart = self.clock() - elapsed
+                wait = self.replayStart + elapsed - self.clock()
+                if wait > 0:
+                    self.sleep(wait)
+
+        if error:
+            raise IOError(error, 'replayed error on device 0x%02X' % address)
+        return payload
+
+    def read_byte_data(self, address, reg):
+        return self.next(OP_READ_BYTE, address, reg, 1)[0]
+
+    def write_byte_data(self, address, reg, value):
+        self.next(OP_WRITE_BYTE, address, reg, 1, [value & 0xFF])
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        return list(self.next(OP_READ_BLOCK, address, reg, length))
+
+    def write_i2c_block_data(self, address, reg, data):
+        self.next(OP_WRITE_BLOCK, address, reg, len(data), data)
+
+    def close(self):
+        pass
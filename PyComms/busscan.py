@@ -0,0 +1,160 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import json
+import os
+import threading
+
+# External Imports
+pass
+
+# Custom Imports
+from buslock import getBusLock
+from pycomms import PyComms, busPool
+from pycommserrors import NO_RETRY
+
+# ===========================================================================
+# Bus scan, chip detection and driver binding
+# ===========================================================================
+
+# 7-bit addresses that are not reserved
+SCAN_RANGE = range(0x03, 0x78)
+
+# driver classes that can be detected, in the order they get tried
+drivers = []
+driversLock = threading.Lock()
+
+# results of previous detections for bus objects (numbered buses are cached
+# on disk, see cacheFile)
+memoryCache = {}
+
+def registerDriver(cls, addresses, fallback = False):
+    # Makes a driver detectable. cls.detect(i2c) gets a PyComms for a
+    # candidate address and returns True when the chip there is one of its
+    # own. Drivers with a weak, heuristic detect register as fallback and
+    # are only tried once every other driver said no.
+    with driversLock:
+        for entry in drivers:
+            if entry[0] is cls:
+                return
+        drivers.append((cls, frozenset(addresses), fallback))
+        drivers.sort(key = lambda entry: entry[2])
+
+def getDriver(name):
+    with driversLock:
+        for cls, addresses, fallback in drivers:
+            if cls.__name__ == name:
+                return cls
+    return None
+
+def resolveBus(bus):
+    # bus number or bus object, same as PyComms takes
+    if isinstance(bus, int):
+        return busPool.acquire(bus), lambda: busPool.release(bus)
+    return bus, lambda: None
+
+def scanBus(bus, addresses = SCAN_RANGE):
+    # Returns the addresses in addresses that acknowledge a read of register 0
+    rawBus, release = resolveBus(bus)
+    lock = getBusLock(rawBus)
+    found = []
+    try:
+        for address in addresses:
+            lock.acquire()
+            try:
+                rawBus.read_byte_data(address, 0)
+                found.append(address)
+            except (IOError):
+                pass
+            finally:
+                lock.release()
+    finally:
+        release()
+    return found
+
+def identify(bus, address):
+    # Name of the driver whose chip sits at address, None when nobody knows it
+    i2c = PyComms(address, bus, retry = NO_RETRY)
+    try:
+        with driversLock:
+            candidates = [cls for cls, addresses, fallback in drivers if address in addresses]
+        for cls in candidates:
+            try:
+                if cls.detect(i2c):
+                    return cls.__name__
+            except (IOError):
+                pass
+    finally:
+        i2c.close()
+    return None
+
+def cacheFile(busNumber):
+    return os.path.join(os.path.expanduser('~'), '.cache', 'pycomms', 'bus%d.json' % busNumber)
+
+def loadCache(bus):
+    if not isinstance(bus, int):
+        entry = memoryCache.get(id(bus))
+        if entry is not None and entry[0] is bus:
+            return dict(entry[1])
+        return None
+
+    try:
+        with open(cacheFile(bus)) as f:
+            devices = json.load(f)['devices']
+        return dict((int(address, 16), name) for address, name in devices.items())
+    except (IOError, ValueError, KeyError):
+        return None
+
+def saveCache(bus, devices):
+    if not isinstance(bus, int):
+        memoryCache[id(bus)] = (bus, dict(devices))
+        return
+
+    path = cacheFile(bus)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'devices' : dict(('0x%02X' % address, name) for address, name in devices.items())}, f, indent = 2, sort_keys = True)
+        os.rename(path + '.tmp', path)
+    except (IOError, OSError):
+        # no cache then, the next start scans again
+        pass
+
+def clearCache(bus):
+    if not isinstance(bus, int):
+        memoryCache.pop(id(bus), None)
+        return
+    try:
+        os.remove(cacheFile(bus))
+    except (OSError):
+        pass
+
+def detectDevices(bus, useCache = True, addresses = SCAN_RANGE):
+    # Returns {address: driver name} of the known chips on bus. A cached
+    # result is checked by running detect on the cached addresses only, the
+    # full range gets probed when there is no cache or it doesn't match
+    # any more.
+    if useCache:
+        cached = loadCache(bus)
+        if cached and all(identify(bus, address) == name for address, name in cached.items()):
+            return cached
+
+    devices = {}
+    for address in scanBus(bus, addresses):
+        name = identify(bus, address)
+        if name is not None:
+            devices[address] = name
+
+    if useCache:
+        saveCache(bus, devices)
+    return devices
+
+def openDevices(bus, useCache = True, addresses = SCAN_RANGE):
+    # Detects the chips on bus and returns {address: driver instance}
+    devices = {}
+    for address, name in sorted(detectDevices(bus, useCache, addresses).items()):
+        cls = getDriver(name)
+        if cls is not None:
+            devices[address] = cls(address = address, bus = bus)
+    return devices
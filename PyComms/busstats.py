@@ -0,0 +1,120 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import time
+
+# External Imports
+pass
+
+# Custom Imports
+from i2cbus import I2CBus
+
+# ===========================================================================
+# BusStats per-device transaction instrumentation
+# ===========================================================================
+
+# upper bounds of the latency histogram buckets in seconds, the last bucket
+# catches everything slower
+LATENCY_BUCKETS = [50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, float('inf')]
+
+class OpStats:
+    __slots__ = ('count', 'bytes', 'errors', 'time', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.time = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, length, elapsed, error):
+        self.count += 1
+        self.bytes += length
+        self.time += elapsed
+        if error:
+            self.errors += 1
+
+        for i, limit in enumerate(LATENCY_BUCKETS):
+            if elapsed <= limit:
+                self.histogram[i] += 1
+                break
+
+    def snapshot(self):
+        return {
+            'count' : self.count,
+            'bytes' : self.bytes,
+            'errors' : self.errors,
+            'time' : self.time,
+            'histogram' : list(self.histogram)}
+
+class BusStats:
+    # Counts, bytes, errors and latency histograms per bus operation and per
+    # (start) register of one device
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ops = {}
+        self.registers = {}
+        self.total = OpStats()
+
+    def record(self, op, reg, length, elapsed, error = False):
+        stats = self.ops.get(op)
+        if stats is None:
+            stats = self.ops[op] = OpStats()
+        stats.add(length, elapsed, error)
+
+        stats = self.registers.get(reg)
+        if stats is None:
+            stats = self.registers[reg] = OpStats()
+        stats.add(length, elapsed, error)
+
+        self.total.add(length, elapsed, error)
+
+    def snapshot(self):
+        # Plain dict copy of the current numbers, safe to keep while recording goes on
+        return {
+            'buckets' : list(LATENCY_BUCKETS),
+            'total' : self.total.snapshot(),
+            'ops' : dict((op, stats.snapshot()) for op, stats in list(self.ops.items())),
+            'registers' : dict((reg, stats.snapshot()) for reg, stats in list(self.registers.items()))}
+
+class InstrumentedBus(I2CBus):
+    # Bus wrapper that times every transfer and records it in a BusStats,
+    # PyComms only puts it in place while stats are enabled
+
+    def __init__(self, bus, stats, clock = time.perf_counter):
+        self.bus = bus
+        self.stats = stats
+        self.clock = clock
+        self.blockMax = getattr(bus, 'blockMax', I2CBus.blockMax)
+
+    def timed(self, op, reg, length, function, *args):
+        start = self.clock()
+        try:
+            result = function(*args)
+        except (IOError):
+            self.stats.record(op, reg, length, self.clock() - start, True)
+            raise
+        self.stats.record(op, reg, length, self.clock() - start)
+        return result
+
+    def read_byte_data(self, address, reg):
+        return self.timed('read_byte_data', reg, 1, self.bus.read_byte_data, address, reg)
+
+    def write_byte_data(self, address, reg, value):
+        return self.timed('write_byte_data', reg, 1, self.bus.write_byte_data, address, reg, value)
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        return self.timed('read_i2c_block_data', reg, length, self.bus.read_i2c_block_data, address, reg, length)
+
+    def write_i2c_block_data(self, address, reg, data):
+        return self.timed('write_i2c_block_data', reg, len(data), self.bus.write_i2c_block_data, address, reg, data)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        # anything else the wrapped bus offers goes through untimed
+        return getattr(self.bus, name)
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import struct
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# Cached struct decoding of register data
+# ===========================================================================
+
+# compiled struct.Struct objects by format string
+structs = {}
+
+def getStruct(fmt):
+    s = structs.get(fmt)
+    if s is None:
+        s = structs[fmt] = struct.Struct(fmt)
+    return s
+
+def asBuffer(data):
+    # Lists of byte values (readBytes* output) become bytes, anything with
+    # the buffer interface (bytes, bytearray, memoryview, numpy) is used as is
+    if isinstance(data, (list, tuple)):
+        try:
+            return bytes(bytearray(data))
+        except ValueError:
+            # signed bytes from readBytesListS
+            return bytes(bytearray([b & 0xFF for b in data]))
+    return data
+
+def unpack(fmt, data, offset = 0):
+    # struct.unpack_from with the compiled Struct cached per format
+    return getStruct(fmt).unpack_from(asBuffer(data), offset)
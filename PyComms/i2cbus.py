@@ -0,0 +1,52 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+from abc import ABC, abstractmethod
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# I2CBus backend interface
+# ===========================================================================
+
+class I2CBus(ABC):
+    # Everything PyComms expects from the bus object it is given. smbus.SMBus
+    # provides these methods natively, other backends (I2CDev, SimBus) derive
+    # from this class and can't be instantiated before they implement all
+    # four transfers. Failed transfers have to raise IOError, like smbus does.
+
+    # largest number of bytes a single block transfer may carry
+    blockMax = 32
+
+    @abstractmethod
+    def read_byte_data(self, address, reg):
+        # Returns the value of register reg on the device at address
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_byte_data(self, address, reg, value):
+        # Writes a single byte to register reg
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_i2c_block_data(self, address, reg, length = 32):
+        # Returns a list of length bytes read starting at register reg
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_i2c_block_data(self, address, reg, data):
+        # Writes a list of bytes starting at register reg
+        raise NotImplementedError
+
+    def read_i2c_block_into(self, address, reg, buffer):
+        # Optional, fills the writable byte buffer (a memoryview) with the
+        # len(buffer) bytes starting at register reg. Backends that can read
+        # straight into it override this, by default it copies a block read.
+        buffer[:] = bytes(bytearray(self.read_i2c_block_data(address, reg, len(buffer))))
+
+    def close(self):
+        pass
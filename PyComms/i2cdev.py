@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import os
+import fcntl
+import ctypes
+
+# External Imports
+pass
+
+# Custom Imports
+from i2cbus import I2CBus
+
+# ===========================================================================
+# I2CDev raw /dev/i2c-N transport using the I2C_RDWR ioctl
+# ===========================================================================
+
+# linux/i2c-dev.h, linux/i2c.h
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+
+class i2c_msg(ctypes.Structure):
+    _fields_ = [
+        ('addr', ctypes.c_uint16),
+        ('flags', ctypes.c_uint16),
+        ('len', ctypes.c_uint16),
+        ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+class i2c_rdwr_ioctl_data(ctypes.Structure):
+    _fields_ = [
+        ('msgs', ctypes.POINTER(i2c_msg)),
+        ('nmsgs', ctypes.c_uint32)]
+
+class I2CDev(I2CBus):
+    # the kernel refuses I2C_RDWR messages longer than 8192 bytes
+    I2C_MSG_MAX = 8192
+
+    # largest block PyComms should ask for in one read_i2c_block_data call
+    blockMax = I2C_MSG_MAX
+
+    def __init__(self, bus = 0, fd = None, ioctl = fcntl.ioctl):
+        # fd and ioctl can be injected, a fake ioctl gets (fd, I2C_RDWR, i2c_rdwr_ioctl_data)
+        # and has to fill the buffers of the I2C_M_RD messages
+        self.ioctl = ioctl
+
+        if fd is None:
+            self.fd = os.open('/dev/i2c-%d' % bus, os.O_RDWR)
+            self.ownsFd = True
+        else:
+            self.fd = fd
+            self.ownsFd = False
+
+    def close(self):
+        if self.ownsFd and self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+
+    def transfer(self, msgs):
+        # Executes a list of (address, flags, data or length) messages as one
+        # combined transaction with repeated start between the messages,
+        # returns the data of every read message as a list of bytes. A read
+        # message may give a writable buffer instead of its length, the
+        # kernel then fills it directly and it is returned as is.
+        count = len(msgs)
+        packets = (i2c_msg * count)()
+        buffers = []
+
+        for i, (address, flags, data) in enumerate(msgs):
+            if flags & I2C_M_RD and not isinstance(data, int):
+                length = len(data)
+                buf = (ctypes.c_uint8 * length).from_buffer(data)
+            elif flags & I2C_M_RD:
+                length = data
+                buf = (ctypes.c_uint8 * length)()
+            else:
+                length = len(data)
+                buf = (ctypes.c_uint8 * length)(*data)
+
+            if length > self.I2C_MSG_MAX:
+                raise ValueError('I2C message of %d bytes exceeds %d' % (length, self.I2C_MSG_MAX))
+
+            packets[i].addr = address
+            packets[i].flags = flags
+            packets[i].len = length
+            packets[i].buf = buf
+            buffers.append(buf)
+
+        request = i2c_rdwr_ioctl_data(packets, count)
+        self.ioctl(self.fd, I2C_RDWR, request)
+
+        return [list(buffers[i]) if isinstance(msg[2], int) else msg[2] for i, msg in enumerate(msgs) if msg[1] & I2C_M_RD]
+
+    def write(self, address, data):
+        # Plain write transaction
+        self.transfer([(address, 0, data)])
+
+    def writeRead(self, address, data, length):
+        # Register pointer write followed by a read of length bytes after a repeated start
+        return self.transfer([(address, 0, data), (address, I2C_M_RD, length)])[0]
+
+    # I2CBus interface, so an I2CDev can be handed to PyComms as its bus
+
+    def read_byte_data(self, address, reg):
+        return self.writeRead(address, [reg], 1)[0]
+
+    def write_byte_data(self, address, reg, value):
+        self.write(address, [reg, value])
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        # not limited to 32 bytes like the smbus version
+        return self.writeRead(address, [reg], length)
+
+    def read_i2c_block_into(self, address, reg, buffer):
+        # no copy, the kernel writes into buffer
+        self.writeRead(address, [reg], buffer)
+
+    def write_i2c_block_data(self, address, reg, data):
+        self.write(address, [reg] + list(data))
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import math
+import os
+import time
+import fcntl
+import ctypes
+import select
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# InterruptSource blocking wait on an interrupt line
+# ===========================================================================
+
+# linux/gpio.h (chardev ABI v1)
+GPIOHANDLE_REQUEST_INPUT = 0x01
+GPIOEVENT_REQUEST_RISING_EDGE = 0x01
+GPIOEVENT_REQUEST_FALLING_EDGE = 0x02
+GPIOEVENT_REQUEST_BOTH_EDGES = 0x03
+# _IOWR(0xB4, 0x04, struct gpioevent_request)
+GPIO_GET_LINEEVENT_IOCTL = 0xC030B404
+# struct gpioevent_data, u64 timestamp + u32 id, padded
+GPIOEVENT_DATA_SIZE = 16
+
+EDGES = {
+    'rising' : GPIOEVENT_REQUEST_RISING_EDGE,
+    'falling' : GPIOEVENT_REQUEST_FALLING_EDGE,
+    'both' : GPIOEVENT_REQUEST_BOTH_EDGES}
+
+class gpioevent_request(ctypes.Structure):
+    _fields_ = [
+        ('lineoffset', ctypes.c_uint32),
+        ('handleflags', ctypes.c_uint32),
+        ('eventflags', ctypes.c_uint32),
+        ('consumer_label', ctypes.c_char * 32),
+        ('fd', ctypes.c_int)]
+
+def readPending(fd):
+    # default acknowledge, drains a pipe or resets an eventfd counter
+    return os.read(fd, 4096)
+
+class InterruptSource:
+    # Waits for events on any pollable file descriptor. acknowledge(fd) is
+    # called after every event to consume it, so the next wait blocks again.
+    # The constructors below open a GPIO line, for tests a pipe or eventfd
+    # works the same way.
+
+    def __init__(self, fd, acknowledge = readPending, events = select.POLLIN | select.POLLPRI, ownsFd = False):
+        self.fd = fd
+        self.acknowledge = acknowledge
+        self.ownsFd = ownsFd
+        self.poller = select.poll()
+        self.poller.register(fd, events | select.POLLERR)
+        self.count = 0
+
+    @classmethod
+    def fromGpioChip(cls, chip, line, edge = 'rising', label = 'pycomms', ioctl = fcntl.ioctl):
+        # Line event through /dev/gpiochipN, chip is the number or the path
+        if isinstance(chip, int):
+            chip = '/dev/gpiochip%d' % chip
+
+        request = gpioevent_request()
+        request.lineoffset = line
+        request.handleflags = GPIOHANDLE_REQUEST_INPUT
+        request.eventflags = EDGES[edge]
+        request.consumer_label = label.encode('ascii')[:31]
+
+        chipFd = os.open(chip, os.O_RDONLY)
+        try:
+            ioctl(chipFd, GPIO_GET_LINEEVENT_IOCTL, request)
+        finally:
+            os.close(chipFd)
+
+        return cls(request.fd, lambda fd: os.read(fd, GPIOEVENT_DATA_SIZE), select.POLLIN, True)
+
+    @classmethod
+    def fromSysfs(cls, gpio, edge = 'rising', root = '/sys/class/gpio'):
+        # Legacy sysfs interface, exports the gpio when it isn't yet
+        path = os.path.join(root, 'gpio%d' % gpio)
+        if not os.path.isdir(path):
+            with open(os.path.join(root, 'export'), 'w') as f:
+                f.write(str(gpio))
+            # udev needs a moment before the attribute files are writable
+            for attempt in range(20):
+                if os.access(os.path.join(path, 'edge'), os.W_OK):
+                    break
+                time.sleep(0.01)
+
+        with open(os.path.join(path, 'direction'), 'w') as f:
+            f.write('in')
+        with open(os.path.join(path, 'edge'), 'w') as f:
+            f.write(edge)
+
+        fd = os.open(os.path.join(path, 'value'), os.O_RDONLY)
+        source = cls(fd, cls.readValue, select.POLLPRI, True)
+        # the value file starts out readable, clear that
+        cls.readValue(fd)
+        return source
+
+    @staticmethod
+    def readValue(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, 8)
+
+    def wait(self, timeout = None):
+        # Blocks until the line fires or timeout seconds passed, returns True on an event
+        if timeout is not None:
+            # poll() takes milliseconds, rounded up so short timeouts still block
+            timeout = max(0, int(math.ceil(timeout * 1000)))
+        if not self.poller.poll(timeout):
+            return False
+        self.acknowledge(self.fd)
+        self.count += 1
+        return True
+
+    def fileno(self):
+        # lets a source go into select() / selectors together with other fds
+        return self.fd
+
+    def close(self):
+        if self.fd is not None:
+            self.poller.unregister(self.fd)
+            if self.ownsFd:
+                os.close(self.fd)
+        self.fd = None
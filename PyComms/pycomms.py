@@ -1,40 +1,389 @@
 #!/usr/bin/python
 
 # Python Standard Library Imports
-import smbus
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+try:
+    import smbus
+except ImportError:
+    # only needed for real hardware, I2CDev and SimBus work without it
+    smbus = None
 
 # External Imports
 pass
 
 # Custom Imports
-pass
+from buslock import getBusLock, dropBusLock, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from busstats import BusStats, InstrumentedBus
+from busrecorder import BusRecorder, RecordingBus
+from pycommserrors import PyCommsError, ReadError, WriteError, RetryPolicy, NO_RETRY
+from bitfield import BitField
+from decode import getStruct
+
+# the priority classes, errors and BitField are re-exported, drivers only
+# import from pycomms
+__all__ = [
+    'PyComms', 'BusPool', 'busPool', 'openBus',
+    'PRIORITY_HIGH', 'PRIORITY_NORMAL', 'PRIORITY_LOW',
+    'PyCommsError', 'ReadError', 'WriteError', 'RetryPolicy', 'NO_RETRY',
+    'BitField']
 
 # ===========================================================================
 # PyComms I2C Base Class (an rewriten Adafruit_I2C pythone class clone)
 # ===========================================================================
 
+def openBus(number):
+    # Default bus factory, smbus when it is installed, raw /dev/i2c-N otherwise
+    if smbus is not None:
+        return smbus.SMBus(number)
+    
+    from i2cdev import I2CDev
+    return I2CDev(number)
+
+class BusPool:
+    # Registry of open buses keyed by bus number. A bus is opened the first
+    # time somebody acquires it, shared by everyone on the same number and
+    # closed again when the last user releases it.
+    
+    def __init__(self, factory = openBus):
+        self.factory = factory
+        self.buses = {}
+        self.refs = {}
+        self.lock = threading.Lock()
+        
+    def acquire(self, number):
+        with self.lock:
+            bus = self.buses.get(number)
+            if bus is None:
+                bus = self.factory(number)
+                self.buses[number] = bus
+                self.refs[number] = 0
+            self.refs[number] += 1
+            return bus
+            
+    def release(self, number):
+        with self.lock:
+            if number not in self.refs:
+                return
+            self.refs[number] -= 1
+            if self.refs[number] == 0:
+                bus = self.buses.pop(number)
+                del self.refs[number]
+                dropBusLock(bus)
+                close = getattr(bus, 'close', None)
+                if close is not None:
+                    close()
+
+    def openBuses(self):
+        # {bus number: reference count}
+        with self.lock:
+            return dict(self.refs)
+
+busPool = BusPool()
+
+def locked(method):
+    # Runs a PyComms method with the bus lock held at the device priority
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.lock.acquire(self.priority)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.lock.release()
+    return wrapper
+
+def sequence(method):
+    # locked for methods made of several transfers that must not be split up
+    # (read-modify-write), on a bus shared with other processes it holds the
+    # bus for them too, see transaction()
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.transaction():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class PyComms:
-    def __init__(self, address, bus = smbus.SMBus(0)):
+    # SMBus limits a single i2c block transfer to 32 bytes
+    I2C_BLOCK_MAX = 32
+    
+    # bus used when none is given
+    DEFAULT_BUS = 0
+
+    def __init__(self, address, bus = None, autoIncrement = True, priority = PRIORITY_NORMAL, retry = None):
+        # bus is either a bus number, taken from the shared busPool, or an
+        # object implementing the I2CBus interface (i2cbus.py).
+        # autoIncrement tells if the device advances its register pointer
+        # during block writes, priority is the class this device waits in
+        # when the bus is busy, retry is the RetryPolicy for failed
+        # transfers (pycommserrors.py)
+        if bus is None:
+            bus = self.DEFAULT_BUS
+        
+        if isinstance(bus, int):
+            self.busNumber = bus
+            bus = busPool.acquire(bus)
+        else:
+            self.busNumber = None
+            
         self.address = address
         self.bus = bus
+        # self.bus gets wrapped while stats or recording are enabled, rawBus never is
+        self.rawBus = bus
+        self.stats = None
+        self.recorder = None
+        # every PyComms on the same bus shares one lock
+        self.lock = getBusLock(bus)
+        self.priority = priority
+        # failed transfers are retried, then raise ReadError / WriteError
+        if retry is None:
+            retry = RetryPolicy()
+        self.retry = retry
+        self.errorCount = 0
+        self.retryCount = 0
+        self.failureCount = 0
+        # largest block transfer the bus can do in one transaction
+        self.blockMax = getattr(bus, 'blockMax', self.I2C_BLOCK_MAX)
+        # cleared once the adapter rejects an i2c block read
+        self.blockReads = True
+        # register shadow cache, off until enableCache() is called
+        self.cache = None
+        self.volatile = set()
+        self.selfClearing = {}
+        # write batching, see batch(). fixedRegisters are ports that don't
+        # advance the register pointer (FIFO, memory windows), transfers to
+        # them are never retried.
+        self.autoIncrement = autoIncrement
+        self.fixedRegisters = set()
+        self.queue = None
+        # register values of the current snapshot() block
+        self.snapshotValues = None
+
+    def close(self):
+        # Gives a pooled bus back, it gets closed once nobody else uses it
+        if self.busNumber is not None:
+            busPool.release(self.busNumber)
+            self.busNumber = None
+        self.bus = None
+        self.rawBus = None
+
+    def enableStats(self):
+        # Starts recording every transfer of this device (see busstats.py),
+        # while disabled the bus is used directly and nothing gets recorded
+        if self.stats is None:
+            self.stats = BusStats()
+            self.wrapBus()
+        return self.stats
+
+    def disableStats(self):
+        self.stats = None
+        self.wrapBus()
+
+    def wrapBus(self):
+        # Rebuilds self.bus from rawBus, the recorder sits right on the bus
+        # and stats time the recording too
+        bus = self.rawBus
+        if self.recorder is not None:
+            bus = RecordingBus(bus, self.recorder)
+        if self.stats is not None:
+            bus = InstrumentedBus(bus, self.stats)
+        self.bus = bus
+
+    def startRecording(self, target):
+        # Captures every transfer of this device (see busrecorder.py). target
+        # is a path, a binary file or a BusRecorder shared with other devices,
+        # the recording replays through busrecorder.ReplayBus
+        if not isinstance(target, BusRecorder):
+            target = BusRecorder(target)
+        self.recorder = target
+        self.wrapBus()
+        return target
+
+    def stopRecording(self):
+        # Stops capturing and returns the recorder, closing it is up to the caller
+        recorder = self.recorder
+        self.recorder = None
+        self.wrapBus()
+        if recorder is not None:
+            recorder.flush()
+        return recorder
+
+    def getStats(self):
+        # Snapshot of the recorded numbers, None while stats are disabled
+        if self.stats is None:
+            return None
+        return self.stats.snapshot()
+
+    def resetStats(self):
+        if self.stats is not None:
+            self.stats.reset()
+
+    def enableCache(self, volatile = (), selfClearing = None):
+        # Keeps a copy of every register read or written so readU8 (and the
+        # read half of writeBit/writeBits) doesn't have to go to the bus.
+        # volatile registers (status, data, FIFO) are never cached,
+        # selfClearing maps a register to the mask of bits the chip clears
+        # by itself after they were written as 1
+        self.cache = {}
+        self.volatile = set(volatile)
+        self.selfClearing = selfClearing or {}
+
+    def disableCache(self):
+        self.cache = None
+
+    def invalidateCache(self, reg = None):
+        # Forgets one register, or all of them (e.g. after a device reset)
+        if self.cache is None:
+            return
+        if reg is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(reg, None)
+
+    def updateCache(self, reg, value):
+        if reg not in self.volatile:
+            self.cache[reg] = value & ~self.selfClearing.get(reg, 0)
+
+    @contextmanager
+    def transaction(self, priority = None):
+        # Holds the bus for a multi step register sequence, other threads
+        # wait and get the bus by priority class once the sequence is done.
+        # A bus shared with other processes (busbroker.BrokerBus) is held
+        # for them too through its beginSequence / endSequence.
+        if priority is None:
+            priority = self.priority
+        
+        self.lock.acquire(priority)
+        sequence = getattr(self.rawBus, 'beginSequence', None)
+        try:
+            if sequence is not None:
+                sequence()
+            try:
+                yield self
+            finally:
+                if sequence is not None:
+                    self.rawBus.endSequence()
+        finally:
+            self.lock.release()
+
+    def holdDevice(self):
+        # Reserves this device, not the bus, on a bus shared through
+        # busbroker.BrokerBus: other processes' requests to the address wait
+        # until releaseDevice, the other devices stay available. Nothing to
+        # do on other buses.
+        begin = getattr(self.rawBus, 'beginDevice', None)
+        if begin is not None:
+            begin(self.address)
+
+    def releaseDevice(self):
+        end = getattr(self.rawBus, 'endDevice', None)
+        if end is not None:
+            end(self.address)
+
+    @contextmanager
+    def deviceSequence(self):
+        # holdDevice for a sequence with waits in between, e.g. start a
+        # conversion -> sleep -> read the result
+        self.holdDevice()
+        try:
+            yield self
+        finally:
+            self.releaseDevice()
+
+    @contextmanager
+    def batch(self):
+        # Queues write8/writeList calls and sends them when the block exits,
+        # writes to consecutive registers are merged into block writes.
+        # Reads inside the block flush the queue first, so ordering is kept.
+        # The bus stays locked for the whole block.
+        if self.queue is not None:
+            # nested batch, the outer one flushes
+            yield self
+            return
+        
+        with self.transaction():
+            self.queue = []
+            try:
+                yield self
+            finally:
+                self.flush()
+                self.queue = None
+
+    @contextmanager
+    def snapshot(self):
+        # Inside the block every register is read from the bus at most once,
+        # readU8 and everything built on it (readBit, readBits, readField)
+        # get the value of the first read, e.g. one INT_STATUS read for
+        #   with mpu.i2c.snapshot():
+        #       freefall = mpu.getIntFreefallStatus()
+        #       motion = mpu.getIntMotionStatus()
+        # Writes drop the registers they touch from the snapshot. The bus
+        # stays locked for the whole block.
+        if self.snapshotValues is not None:
+            # nested snapshot, shares the outer one
+            yield self
+            return
+
+        with self.transaction():
+            self.snapshotValues = {}
+            try:
+                yield self
+            finally:
+                self.snapshotValues = None
+
+    def forgetSnapshot(self, reg, length = 1):
+        if self.snapshotValues is not None:
+            for i in range(length):
+                self.snapshotValues.pop(reg + i, None)
+
+    @locked
+    def flush(self):
+        # Sends the queued writes, runs of consecutive registers go out as one
+        # block write as long as the device auto increments and the run fits
+        # into blockMax
+        queue = self.queue
+        if not queue:
+            return
+        
+        self.queue = None
+        try:
+            runStart = None
+            runData = []
+            for reg, data in queue:
+                if (runData and self.autoIncrement and
+                        reg == runStart + len(runData) and
+                        reg - 1 not in self.fixedRegisters and
+                        len(runData) + len(data) <= self.blockMax):
+                    runData.extend(data)
+                else:
+                    self.writeRun(runStart, runData)
+                    runStart = reg
+                    runData = list(data)
+            
+            self.writeRun(runStart, runData)
+        finally:
+            self.queue = []
+
+    def writeRun(self, reg, data):
+        if len(data) == 1:
+            self.write8(reg, data[0])
+        elif data:
+            self.writeList(reg, data)
 
     def reverseByteOrder(self, data):
-        # Reverses the byte order of an int (16-bit) or long (32-bit) value
-        # Courtesy Vishal Sapre
-        dstr = hex(data)[2:].replace('L','')
-        byteCount = len(dstr[::2])
-        val = 0
-        for i, n in enumerate(range(byteCount)):
-            d = data & 0xFF
-            val |= (d << (8 * (byteCount - i - 1)))
-            data >>= 8
-        return val
+        # Reverses the byte order of an int (16-bit) or long (32-bit) value,
+        # kept for old callers, bulk data should go through readWordsS/U
+        byteCount = max(1, (data.bit_length() + 7) // 8)
+        return int.from_bytes(data.to_bytes(byteCount, 'big'), 'little')
     
+    @locked
     def readBit(self, reg, bitNum):
         b = self.readU8(reg)
         data = b & (1 << bitNum)
         return data
     
+    @sequence
     def writeBit(self, reg, bitNum, data):
         b = self.readU8(reg)
         
@@ -45,6 +394,7 @@ class PyComms:
             
         return self.write8(reg, b)
     
+    @locked
     def readBits(self, reg, bitStart, length):
         # 01101001 read byte
         # 76543210 bit numbers
@@ -60,6 +410,7 @@ class PyComms:
         return b
         
     
+    @sequence
     def writeBits(self, reg, bitStart, length, data):
         #      010 value to write
         # 76543210 bit numbers
@@ -78,91 +429,309 @@ class PyComms:
             
         return self.write8(reg, b)
 
+    def transfer(self, errorType, op, reg, function, *args):
+        # Calls function(address, *args) on the bus, failed attempts are
+        # retried as far as the retry policy allows, then errorType is raised.
+        # The latency budget includes the first attempt, a slow one (adapter
+        # timeout) leaves less time for retries.
+        started = self.retry.clock()
+        try:
+            return function(self.address, *args)
+        except (IOError) as error:
+            return self.retryTransfer(errorType, op, reg, function, args, error, started)
+
+    def retryTransfer(self, errorType, op, reg, function, args, error, started):
+        policy = self.retry
+        attempt = 1
+        
+        while True:
+            self.errorCount += 1
+            
+            # a failed transfer to a FIFO or memory port may have moved part
+            # of the data already, repeating it would drop or shift bytes
+            delay = None
+            if policy.retryable(error) and reg not in self.fixedRegisters:
+                delay = policy.delay(attempt, started)
+            if delay is None:
+                self.failureCount += 1
+                raise errorType(self.address, reg, op, error, attempt)
+                
+            policy.sleep(delay)
+            self.retryCount += 1
+            attempt += 1
+            
+            try:
+                return function(self.address, *args)
+            except (IOError) as e:
+                error = e
+
+    def getErrorCounts(self):
+        # failed attempts, retries made and calls that gave up with an exception
+        return {
+            'errors' : self.errorCount,
+            'retries' : self.retryCount,
+            'failures' : self.failureCount}
+
+    def readField(self, field):
+        # Reads a BitField, like readBits without working out mask and shift
+        return field.decode(self.readU8(field.reg))
+
+    @sequence
+    def writeField(self, field, data):
+        # Writes a BitField, keeping the other bits of the register
+        return self.write8(field.reg, field.encode(self.readU8(field.reg), data))
+
+    @sequence
+    def readFields(self, *fields):
+        # Reads several BitFields, each register is only read once
+        values = {}
+        output = []
+        
+        for field in fields:
+            value = values.get(field.reg)
+            if value is None:
+                value = values[field.reg] = self.readU8(field.reg)
+            output.append(field.decode(value))
+            
+        return output
+
+    @locked
+    def readBlock(self, reg, length, increment = True):
+        # Reads length bytes in chunks of up to blockMax bytes, each chunk starts at
+        # the next register unless increment is False (FIFO style registers)
+        if self.queue:
+            self.flush()
+            
+        output = []
+        
+        with self.chunked(length):
+            while len(output) < length:
+                count = min(length - len(output), self.blockMax)
+                if increment:
+                    start = reg + len(output)
+                else:
+                    start = reg
+                output.extend(self.transfer(ReadError, 'readBlock', start, self.bus.read_i2c_block_data, start, count))
+            
+        return output
+
+    def chunked(self, length):
+        # transaction() around block reads that take more than one transfer,
+        # a single one needs nothing more than the bus lock
+        if length > self.blockMax:
+            return self.transaction()
+        return nullcontext()
+
+    @locked
     def readBytes(self, reg, length):
+        # Reads length bytes from the same register (FIFO)
+        if self.blockReads:
+            try:
+                return self.readBlock(reg, length, False)
+            except (ReadError) as error:
+                if not error.isUnsupported():
+                    raise
+                # adapter doesn't do block reads, stay on byte reads from now on
+                self.blockReads = False
+        
         output = []
         
-        i = 0
-        while i < length:
-            output.append(self.readU8(reg))
-            i += 1
+        with self.transaction():
+            i = 0
+            while i < length:
+                output.append(self.readU8(reg))
+                i += 1
             
         return output        
         
+    @locked
     def readBytesListU(self, reg, length):
+        # Reads length unsigned bytes from consecutive registers
+        if self.blockReads:
+            try:
+                return self.readBlock(reg, length)
+            except (ReadError) as error:
+                if not error.isUnsupported():
+                    raise
+                self.blockReads = False
+        
         output = []
         
-        i = 0
-        while i < length:
-            output.append(self.readU8(reg + i))
-            i += 1
+        with self.transaction():
+            i = 0
+            while i < length:
+                output.append(self.readU8(reg + i))
+                i += 1
             
         return output
 
+    @locked
     def readBytesListS(self, reg, length):
+        # Reads length signed bytes from consecutive registers
+        if self.blockReads:
+            try:
+                output = self.readBlock(reg, length)
+                return [b - 256 if b > 127 else b for b in output]
+            except (ReadError) as error:
+                if not error.isUnsupported():
+                    raise
+                self.blockReads = False
+        
         output = []
         
-        i = 0
-        while i < length:
-            output.append(self.readS8(reg + i))
-            i += 1
+        with self.transaction():
+            i = 0
+            while i < length:
+                output.append(self.readS8(reg + i))
+                i += 1
             
         return output        
+
+    @locked
+    def readinto(self, reg, buffer, offset = 0, length = None, increment = True):
+        # Reads into buffer[offset:offset + length] (to the end of buffer by
+        # default) instead of returning a new list. buffer is anything with
+        # a writable buffer interface, bytearray, memoryview, array or numpy,
+        # offset and length count bytes. Chunks and register addressing work
+        # like readBlock, increment = False reads a FIFO register. Returns
+        # the number of bytes read.
+        if self.queue:
+            self.flush()
+
+        view = memoryview(buffer).cast('B')
+        if length is None:
+            length = len(view) - offset
+        view = view[offset:offset + length]
+
+        readInto = getattr(self.bus, 'read_i2c_block_into', None)
+        if self.blockReads:
+            try:
+                done = 0
+                with self.chunked(length):
+                    while done < length:
+                        count = min(length - done, self.blockMax)
+                        if increment:
+                            start = reg + done
+                        else:
+                            start = reg
+                        if readInto is not None:
+                            self.transfer(ReadError, 'readinto', start, readInto, start, view[done:done + count])
+                        else:
+                            # smbus.SMBus only returns lists
+                            view[done:done + count] = bytes(bytearray(self.transfer(ReadError, 'readinto', start, self.bus.read_i2c_block_data, start, count)))
+                        done += count
+                return length
+            except (ReadError) as error:
+                if not error.isUnsupported():
+                    raise
+                self.blockReads = False
+
+        with self.transaction():
+            for i in range(length):
+                if increment:
+                    view[i] = self.readU8(reg + i)
+                else:
+                    view[i] = self.readU8(reg)
+        return length
+
+    def readStruct(self, reg, fmt):
+        # Reads the struct.calcsize(fmt) bytes starting at reg as one block
+        # transfer (up to blockMax bytes) and returns them decoded, e.g.
+        # readStruct(reg, '>hhH'). The compiled struct is cached per format.
+        record = getStruct(fmt)
+        return record.unpack(bytes(bytearray(self.readBytesListU(reg, record.size))))
+
+    def readWordsS(self, reg, count):
+        # Reads count big-endian signed 16-bit values starting at reg
+        return self.readStruct(reg, '>%dh' % count)
+
+    def readWordsU(self, reg, count):
+        # Reads count big-endian unsigned 16-bit values starting at reg
+        return self.readStruct(reg, '>%dH' % count)
     
+    @locked
     def writeList(self, reg, list):
         # Writes an array of bytes using I2C format"
+        self.forgetSnapshot(reg, len(list))
+        if self.queue is not None:
+            self.queue.append((reg, list))
+            return
+        
         try:
-            self.bus.write_i2c_block_data(self.address, reg, list)
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-        return -1    
+            self.transfer(WriteError, 'writeList', reg, self.bus.write_i2c_block_data, reg, list)
+        except (WriteError):
+            # don't know what made it to the chip
+            if self.cache is not None:
+                for written in self.blockTargets(reg, list):
+                    self.cache.pop(written, None)
+            raise
+            
+        if self.cache is not None:
+            for written, value in self.blockTargets(reg, list).items():
+                self.updateCache(written, value)
+
+    def blockTargets(self, reg, data):
+        # {register: value it ends up with} for a block write of data at reg,
+        # the register pointer stays put on fixedRegisters (and everywhere
+        # if the device doesn't auto increment)
+        targets = {}
+        for value in data:
+            targets[reg] = value
+            if self.autoIncrement and reg not in self.fixedRegisters:
+                reg += 1
+        return targets
     
+    @locked
     def write8(self, reg, value):
         # Writes an 8-bit value to the specified register/address
+        self.forgetSnapshot(reg)
+        if self.queue is not None:
+            self.queue.append((reg, [value]))
+            return
+        
         try:
-            self.bus.write_byte_data(self.address, reg, value)
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-            return -1
+            self.transfer(WriteError, 'write8', reg, self.bus.write_byte_data, reg, value)
+        except (WriteError):
+            if self.cache is not None:
+                self.cache.pop(reg, None)
+            raise
+            
+        if self.cache is not None:
+            self.updateCache(reg, value)
 
+    @locked
     def readU8(self, reg):
         # Read an unsigned byte from the I2C device
-        try:
-            result = self.bus.read_byte_data(self.address, reg)
-            return result
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-            return -1
+        if self.queue:
+            self.flush()
+        if self.snapshotValues is not None and reg in self.snapshotValues:
+            return self.snapshotValues[reg]
+        if self.cache is not None and reg in self.cache:
+            return self.cache[reg]
+            
+        result = self.transfer(ReadError, 'readU8', reg, self.bus.read_byte_data, reg)
+        if self.cache is not None:
+            self.updateCache(reg, result)
+        if self.snapshotValues is not None:
+            self.snapshotValues[reg] = result
+        return result
 
+    @locked
     def readS8(self, reg):
         # Reads a signed byte from the I2C device
-        try:
-            result = self.bus.read_byte_data(self.address, reg)
-            if result > 127:
-                return result - 256
-            else:
-                return result
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-            return -1
+        if self.queue:
+            self.flush()
+            
+        result = self.transfer(ReadError, 'readS8', reg, self.bus.read_byte_data, reg)
+        if result > 127:
+            return result - 256
+        else:
+            return result
 
     def readU16(self, reg):
         # Reads an unsigned 16-bit value from the I2C device
-        try:
-            hibyte = self.bus.read_byte_data(self.address, reg)
-            result = (hibyte << 8) + self.bus.read_byte_data(self.address, reg + 1)
-            return result
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-            return -1
+        return self.readStruct(reg, '>H')[0]
 
     def readS16(self, reg):
         # Reads a signed 16-bit value from the I2C device
-        try:
-            hibyte = self.bus.read_byte_data(self.address, reg)
-            if hibyte > 127:
-                hibyte -= 256
-            result = (hibyte << 8) + self.bus.read_byte_data(self.address, reg + 1)
-            return result
-        except (IOError):
-            print ("Error accessing 0x%02X: Check your I2C address" % self.address)
-            return -1
\ No newline at end of file
+        return self.readStruct(reg, '>h')[0]
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import errno
+import time
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# PyComms exceptions and retry policy
+# ===========================================================================
+
+# errors an adapter answers transfers it doesn't implement with (e.g. i2c
+# block reads on SMBus-only controllers)
+UNSUPPORTED_ERRORS = (errno.EOPNOTSUPP, errno.EINVAL)
+
+class PyCommsError(IOError):
+    # A transfer that still failed after the retry policy gave up. Derives
+    # from IOError so code written against smbus keeps catching it.
+
+    def __init__(self, address, reg, op, cause, attempts):
+        IOError.__init__(self, getattr(cause, 'errno', None),
+            '%s of register 0x%02X on device 0x%02X failed after %d attempt(s): %s' % (op, reg, address, attempts, cause))
+        self.address = address
+        self.reg = reg
+        self.op = op
+        self.cause = cause
+        self.attempts = attempts
+
+    def isRetryable(self):
+        return RetryPolicy.retryable(self.cause)
+
+    def isUnsupported(self):
+        # the adapter can't do this kind of transfer at all, as opposed to
+        # the device not answering this time (NACK, timeout, ...)
+        return getattr(self.cause, 'errno', None) in UNSUPPORTED_ERRORS
+
+class ReadError(PyCommsError):
+    pass
+
+class WriteError(PyCommsError):
+    pass
+
+class RetryPolicy:
+    # Bounded retry with exponential backoff. A call is retried at most
+    # retries times and never once the next attempt would end past budget
+    # seconds after the first one started. clock has to be monotonic, wall
+    # clock steps (NTP) would stretch or cut the budget.
+
+    # errors that won't go away by trying again (adapter can't do the
+    # transfer at all, closed bus, ...)
+    PERMANENT_ERRORS = (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTTY, errno.EBADF)
+
+    def __init__(self, retries = 2, backoff = 0.0002, factor = 2.0, budget = 0.005, sleep = time.sleep, clock = time.monotonic):
+        self.retries = retries
+        self.backoff = backoff
+        self.factor = factor
+        self.budget = budget
+        self.sleep = sleep
+        self.clock = clock
+
+    @staticmethod
+    def retryable(error):
+        return getattr(error, 'errno', None) not in RetryPolicy.PERMANENT_ERRORS
+
+    def delay(self, attempt, started):
+        # Seconds to wait before retry number attempt (1 based), None to give up
+        if attempt > self.retries:
+            return None
+
+        delay = self.backoff * (self.factor ** (attempt - 1))
+        if self.clock() + delay - started > self.budget:
+            return None
+
+        return delay
+
+# no retries at all, the first error is raised
+NO_RETRY = RetryPolicy(retries = 0)
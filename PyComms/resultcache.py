@@ -0,0 +1,103 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import threading
+import time
+from functools import wraps
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# ResultCache time to live cache of slow sensor getters
+# ===========================================================================
+
+class ResultCache:
+    # Keeps the last result of every cached getter of a device together with
+    # the time it was read. Within the getter's time to live, usually one
+    # output period of the sensor, the last result is returned instead of
+    # reading again. Getters without a ttl (or ttl 0) are never cached.
+
+    def __init__(self, clock = time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        # getter name -> seconds
+        self.ttls = {}
+        # (getter name, arguments) -> (result, time read)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def setTTL(self, name, ttl):
+        # ttl None or 0 turns caching of name off
+        with self.lock:
+            self.ttls[name] = ttl
+            if not ttl:
+                self.forget(name)
+
+    def getTTL(self, name):
+        return self.ttls.get(name)
+
+    def call(self, name, function, key = (), bypass = False):
+        # Returns the cached result of name(key) while it is younger than the
+        # ttl, calls function otherwise. bypass always calls function and
+        # caches what it returns.
+        ttl = self.ttls.get(name)
+        if not ttl:
+            return function()
+
+        # held during the read, concurrent callers wait and get its result
+        with self.lock:
+            now = self.clock()
+            entry = self.entries.get((name, key))
+            if entry is not None and not bypass and now - entry[1] < ttl:
+                self.hits += 1
+                return entry[0]
+
+            result = function()
+            # the data is latched at the end of the read (after a conversion wait)
+            self.entries[(name, key)] = (result, self.clock())
+            self.misses += 1
+            return result
+
+    def last(self, name, *args):
+        # (result, age in seconds) of the newest cached name(*args), None if there is none
+        with self.lock:
+            entry = self.entries.get((name, args))
+            if entry is None:
+                return None
+            return entry[0], self.clock() - entry[1]
+
+    def age(self, name, *args):
+        # Seconds since name(*args) was read, None when nothing is cached
+        last = self.last(name, *args)
+        if last is None:
+            return None
+        return last[1]
+
+    def invalidate(self, name = None):
+        # Forgets the results of one getter, or all of them (config changes)
+        with self.lock:
+            self.forget(name)
+
+    def forget(self, name):
+        if name is None:
+            self.entries.clear()
+        else:
+            for key in [key for key in self.entries if key[0] == name]:
+                del self.entries[key]
+
+def cachedResult(method):
+    # Method decorator, the result goes through the instance's ResultCache
+    # (self.results) under the method name. Every call takes an additional
+    # bypass = True to read the sensor regardless of the cache.
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bypass = kwargs.pop('bypass', False)
+        return self.results.call(name, lambda: method(self, *args, **kwargs), args + tuple(sorted(kwargs.items())), bypass)
+    return wrapper
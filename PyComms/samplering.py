@@ -0,0 +1,185 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# SampleRing single producer / multi consumer ring in shared memory
+# ===========================================================================
+
+# record layouts, all start with the timestamp (time.time())
+QUATERNION_RECORD = '<d4f'   # w, x, y, z
+MOTION_RECORD     = '<d6h'   # raw ax, ay, az, gx, gy, gz
+HEADING_RECORD    = '<d3h'   # raw x, y, z
+PRESSURE_RECORD   = '<did'   # pascal, degrees celcius
+
+# header: magic, version, record size, capacity, last published sequence,
+# record format. Every slot is a sequence word followed by the record.
+MAGIC = b'PYSR'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xIIQ32s')
+HEADER_SIZE = 64
+HEAD_OFFSET = 16
+WORD = struct.Struct('<Q')
+
+class SampleRing:
+    # Fixed size records in a shared memory block. The one producer calls
+    # publish(), any number of processes attach() by name and read. Nothing
+    # is locked: a slot's sequence word is odd while the producer writes it
+    # and twice the record's sequence number once it is complete, readers
+    # check it before and after decoding so they never return a torn or
+    # overwritten record. Sequence numbers start at 1.
+
+    def __init__(self, fmt, capacity = 1024, name = None):
+        # Creates a new ring for records of struct format fmt
+        self.record = struct.Struct(fmt)
+        self.capacity = capacity
+        self.slotSize = (WORD.size + self.record.size + 7) & ~7
+        self.shm = shared_memory.SharedMemory(name, create = True, size = HEADER_SIZE + capacity * self.slotSize)
+        self.owner = True
+        self.buf = self.shm.buf
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, self.record.size, capacity, 0, fmt.encode('ascii'))
+        self.sequence = 0
+
+    @classmethod
+    def attach(cls, name):
+        # Opens an existing ring created by another process
+        ring = cls.__new__(cls)
+        try:
+            shm = shared_memory.SharedMemory(name, track = False)
+        except (TypeError):
+            # before python 3.13 attaching registers the block with the
+            # resource tracker, which would unlink it when the reader exits.
+            # The block isn't ours, always take it off again.
+            shm = shared_memory.SharedMemory(name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+
+        magic, version, recordSize, capacity, head, fmt = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise ValueError('%s is not a version %d sample ring' % (name, VERSION))
+
+        ring.record = struct.Struct(fmt.rstrip(b'\0').decode('ascii'))
+        ring.capacity = capacity
+        ring.slotSize = (WORD.size + recordSize + 7) & ~7
+        ring.shm = shm
+        ring.owner = False
+        ring.buf = shm.buf
+        ring.sequence = head
+        return ring
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # Detaches, the producer also removes the shared memory block. Views
+        # handed out by view() have to be released first.
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            # a forked reader shares our resource tracker and took the block
+            # off it when attaching, register it again so unlink() can take
+            # it off cleanly
+            resource_tracker.register(self.shm._name, 'shared_memory')
+            self.shm.unlink()
+
+    def slot(self, seq):
+        return HEADER_SIZE + (seq % self.capacity) * self.slotSize
+
+    def publish(self, *values):
+        # Producer side, returns the sequence number of the new record
+        seq = self.sequence + 1
+        offset = self.slot(seq)
+        WORD.pack_into(self.buf, offset, 2 * seq - 1)
+        self.record.pack_into(self.buf, offset + WORD.size, *values)
+        WORD.pack_into(self.buf, offset, 2 * seq)
+        WORD.pack_into(self.buf, HEAD_OFFSET, seq)
+        self.sequence = seq
+        return seq
+
+    def publisher(self, convert = None):
+        # onResult callback for a scheduler.Scheduler job, publishes the
+        # timestamp followed by convert(result) (the result itself by default)
+        def onResult(job, result):
+            if result is None:
+                return
+            if convert is not None:
+                result = convert(result)
+            self.publish(time.time(), *result)
+        return onResult
+
+    def head(self):
+        # sequence number of the newest record, 0 while the ring is empty
+        return WORD.unpack_from(self.buf, HEAD_OFFSET)[0]
+
+    def read(self, seq):
+        # Decodes record seq straight out of shared memory. Returns None when
+        # it has been overwritten already (or isn't published yet).
+        offset = self.slot(seq)
+        if WORD.unpack_from(self.buf, offset)[0] != 2 * seq:
+            return None
+        values = self.record.unpack_from(self.buf, offset + WORD.size)
+        if WORD.unpack_from(self.buf, offset)[0] != 2 * seq:
+            return None
+        return values
+
+    def view(self, seq):
+        # memoryview of the raw record seq, for readers decoding it themselves.
+        # The producer may overwrite it at any time, valid(seq) tells if it
+        # still held seq once the reader is done with it.
+        offset = self.slot(seq) + WORD.size
+        return self.buf[offset:offset + self.record.size]
+
+    def valid(self, seq):
+        return WORD.unpack_from(self.buf, self.slot(seq))[0] == 2 * seq
+
+    def latest(self):
+        # (seq, values) of the newest record, None while the ring is empty
+        while True:
+            seq = self.head()
+            if seq == 0:
+                return None
+            values = self.read(seq)
+            if values is not None:
+                return seq, values
+
+class RingReader:
+    # Cursor of one consumer. Counts records it lost because the producer
+    # got a whole ring ahead of it.
+
+    def __init__(self, ring, fromStart = False):
+        self.ring = ring
+        self.lost = 0
+        # next sequence number to read
+        if fromStart:
+            self.next = max(1, ring.head() - ring.capacity + 2)
+        else:
+            self.next = ring.head() + 1
+
+    def poll(self, limit = None):
+        # Returns [(seq, values), ...] of the records published since the last poll
+        head = self.ring.head()
+        # the slot after head may be half way through being overwritten
+        oldest = head - self.ring.capacity + 2
+        if self.next < oldest:
+            self.lost += oldest - self.next
+            self.next = oldest
+
+        records = []
+        while self.next <= head and (limit is None or len(records) < limit):
+            values = self.ring.read(self.next)
+            if values is None:
+                self.lost += 1
+            else:
+                records.append((self.next, values))
+            self.next += 1
+        return records
@@ -0,0 +1,238 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import heapq
+import inspect
+import itertools
+import threading
+import time
+
+# External Imports
+pass
+
+# Custom Imports
+pass
+
+# ===========================================================================
+# Scheduler earliest-deadline-first polling of the devices on a bus
+# ===========================================================================
+
+class Job:
+    # A periodic poll. function is called once per period, it either returns
+    # the result straight away or is a generator function that yields the
+    # seconds it wants to wait (a conversion, ...) and returns the result at
+    # the end. While a job waits the bus goes to the other jobs.
+
+    def __init__(self, name, function, period, deadline, cost, onResult, onError):
+        self.name = name
+        self.function = function
+        self.period = period
+        # relative deadline, a release has to be done deadline seconds after it started
+        self.deadline = deadline
+        # estimated bus time of one release in seconds
+        self.cost = cost
+        self.onResult = onResult
+        self.onError = onError
+        self.nextRelease = None
+        self.active = None
+        self.resetStats()
+
+    def resetStats(self):
+        self.releases = 0
+        self.completions = 0
+        self.misses = 0
+        self.skipped = 0
+        self.errors = 0
+        self.lastError = None
+        self.maxLateness = 0.0
+        self.busyTime = 0.0
+
+    def stats(self):
+        return {
+            'period' : self.period,
+            'deadline' : self.deadline,
+            'cost' : self.cost,
+            'releases' : self.releases,
+            'completions' : self.completions,
+            'misses' : self.misses,
+            'skipped' : self.skipped,
+            'errors' : self.errors,
+            'maxLateness' : self.maxLateness,
+            'busyTime' : self.busyTime}
+
+class Release:
+    # One period of a job, from its release until it returns a result
+
+    def __init__(self, job, released):
+        self.job = job
+        self.released = released
+        self.deadline = released + job.deadline
+        self.steps = None
+
+class Scheduler:
+    # Runs the jobs of one bus on the calling thread, always the runnable
+    # release with the earliest absolute deadline first. A release still
+    # running (waiting on a continuation) when its next period starts makes
+    # that period get skipped, counted as a miss.
+
+    def __init__(self, clock = time.monotonic):
+        self.clock = clock
+        self.jobs = {}
+        # (deadline, ticket, release) runnable now
+        self.ready = []
+        # (time, ticket, job or release) waiting for a release or a continuation
+        self.timers = []
+        self.tickets = itertools.count()
+        self.stopped = threading.Event()
+
+    def addJob(self, name, function, rate, deadline = None, cost = 0.0, onResult = None, onError = None):
+        # rate in Hz, deadline in seconds after each release (the period by
+        # default), cost the estimated bus time of one release in seconds.
+        # Raises ValueError when the jobs together would need more bus time
+        # than there is.
+        if name in self.jobs:
+            raise ValueError('job %s already exists' % name)
+
+        period = 1.0 / rate
+        if deadline is None:
+            deadline = period
+        job = Job(name, function, period, deadline, cost, onResult, onError)
+
+        if self.utilization() + cost / period > 1.0:
+            raise ValueError('job %s would need more than the whole bus' % name)
+
+        self.jobs[name] = job
+        job.nextRelease = self.clock()
+        self.schedule(job.nextRelease, job)
+        return job
+
+    def removeJob(self, name):
+        job = self.jobs.pop(name)
+        # pending entries of the job get dropped when they come up
+        job.nextRelease = None
+        self.closeRelease(job)
+
+    def closeRelease(self, job):
+        # Abandons the release job is in the middle of, closing its generator
+        # runs its finally blocks (e.g. BMP085 releasing conversionLock)
+        if job.active is not None and job.active.steps is not None:
+            job.active.steps.close()
+        job.active = None
+
+    def utilization(self):
+        # share of the bus time the jobs are expected to use
+        return sum(job.cost / job.period for job in self.jobs.values())
+
+    def schedule(self, when, entry):
+        heapq.heappush(self.timers, (when, next(self.tickets), entry))
+
+    def stats(self):
+        return dict((name, job.stats()) for name, job in self.jobs.items())
+
+    def release(self, job, now):
+        # next period on the original grid, periods already over are skipped
+        released = job.nextRelease
+        job.nextRelease += job.period
+        if job.nextRelease <= now:
+            missed = int((now - job.nextRelease) / job.period) + 1
+            job.skipped += missed
+            job.misses += missed
+            job.nextRelease += missed * job.period
+        self.schedule(job.nextRelease, job)
+
+        if job.active is not None:
+            # the previous period is still waiting on a continuation
+            job.skipped += 1
+            job.misses += 1
+            return
+
+        job.releases += 1
+        job.active = Release(job, released)
+        heapq.heappush(self.ready, (job.active.deadline, next(self.tickets), job.active))
+
+    def step(self, entry):
+        job = entry.job
+        started = self.clock()
+        try:
+            if entry.steps is None:
+                result = job.function()
+                if inspect.isgenerator(result):
+                    entry.steps = result
+            if entry.steps is not None:
+                delay = next(entry.steps)
+                job.busyTime += self.clock() - started
+                self.schedule(self.clock() + delay, entry)
+                return
+        except (StopIteration) as done:
+            result = done.value
+        except (Exception) as error:
+            job.busyTime += self.clock() - started
+            job.active = None
+            job.errors += 1
+            job.lastError = error
+            if job.onError is not None:
+                job.onError(job, error)
+            return
+
+        finished = self.clock()
+        job.busyTime += finished - started
+        job.active = None
+        job.completions += 1
+        if finished > entry.deadline:
+            job.misses += 1
+            job.maxLateness = max(job.maxLateness, finished - entry.deadline)
+        if job.onResult is not None:
+            job.onResult(job, result)
+
+    def runOnce(self, timeout = None):
+        # Runs the next due step, waiting at most timeout seconds for one.
+        # Returns False when nothing was due.
+        now = self.clock()
+        while self.timers and self.timers[0][0] <= now:
+            when, ticket, entry = heapq.heappop(self.timers)
+            if isinstance(entry, Job):
+                if entry.nextRelease is not None and self.jobs.get(entry.name) is entry:
+                    self.release(entry, now)
+            elif entry.job.active is entry:
+                heapq.heappush(self.ready, (entry.deadline, next(self.tickets), entry))
+
+        if self.ready:
+            deadline, ticket, entry = heapq.heappop(self.ready)
+            if entry.job.active is entry:
+                self.step(entry)
+            return True
+
+        if self.timers:
+            delay = self.timers[0][0] - now
+            if timeout is not None:
+                delay = min(delay, timeout)
+            if delay > 0:
+                self.stopped.wait(delay)
+        elif timeout is not None:
+            self.stopped.wait(timeout)
+        return False
+
+    def run(self, duration = None):
+        # Runs until stop() is called, or for duration seconds. Releases still
+        # waiting on a continuation are abandoned on the way out, their jobs
+        # start with a fresh release the next time the scheduler runs.
+        self.stopped.clear()
+        end = None
+        if duration is not None:
+            end = self.clock() + duration
+
+        try:
+            while not self.stopped.is_set():
+                timeout = None
+                if end is not None:
+                    timeout = end - self.clock()
+                    if timeout <= 0:
+                        break
+                self.runOnce(timeout)
+        finally:
+            for job in list(self.jobs.values()):
+                self.closeRelease(job)
+
+    def stop(self):
+        # can be called from any thread or from a job
+        self.stopped.set()
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import errno
+
+# External Imports
+pass
+
+# Custom Imports
+from i2cbus import I2CBus
+
+# ===========================================================================
+# SimBus in-memory I2C bus simulator
+# ===========================================================================
+
+class SimDevice:
+    # Register map of one simulated chip. Block transfers advance the register
+    # pointer after every byte when autoIncrement is set, except on registers
+    # listed in fixedRegisters (FIFO / memory ports) which keep the pointer.
+
+    def __init__(self, registers = None, autoIncrement = True, size = 256):
+        self.registers = bytearray(size)
+        self.autoIncrement = autoIncrement
+        self.fixedRegisters = set()
+        self.readHooks = {}
+        self.writeHooks = {}
+
+        if registers:
+            for reg, value in registers.items():
+                self.registers[reg] = value
+
+    def onRead(self, reg, hook):
+        # hook(device, reg) returns the byte to hand out instead of the stored value
+        self.readHooks[reg] = hook
+
+    def onWrite(self, reg, hook):
+        # hook(device, reg, value) gets called after value has been stored
+        self.writeHooks[reg] = hook
+
+    def read(self, reg):
+        reg %= len(self.registers)
+        hook = self.readHooks.get(reg)
+        if hook is not None:
+            return hook(self, reg) & 0xFF
+        return self.registers[reg]
+
+    def write(self, reg, value):
+        reg %= len(self.registers)
+        self.registers[reg] = value & 0xFF
+        hook = self.writeHooks.get(reg)
+        if hook is not None:
+            hook(self, reg, value & 0xFF)
+
+    def nextRegister(self, reg):
+        if self.autoIncrement and reg not in self.fixedRegisters:
+            return (reg + 1) % len(self.registers)
+        return reg
+
+    def readBlock(self, reg, length):
+        output = []
+        for i in range(length):
+            output.append(self.read(reg))
+            reg = self.nextRegister(reg)
+        return output
+
+    def writeBlock(self, reg, data):
+        for value in data:
+            self.write(reg, value)
+            reg = self.nextRegister(reg)
+
+# common SCL clock rates in Hz
+SCL_STANDARD = 100000
+SCL_FAST     = 400000
+
+class WireTiming:
+    # Estimates how long a transfer would take on a real bus: every byte is
+    # 8 data bits plus the ACK bit, START, repeated START and STOP count as
+    # one bit time each, and every transfer pays the fixed cost of the
+    # ioctl / syscall round trip into the kernel adapter driver.
+
+    def __init__(self, scl = SCL_STANDARD, syscall = 40e-6, bitsPerByte = 9):
+        self.scl = scl
+        self.syscall = syscall
+        self.bitsPerByte = bitsPerByte
+
+    def bits(self, written, read):
+        # START, address + register + written bytes, STOP. Reads add a
+        # repeated START and the address again before the data comes in.
+        bits = 2 + (2 + written) * self.bitsPerByte
+        if read:
+            bits += 1 + (1 + read) * self.bitsPerByte
+        return bits
+
+    def transfer(self, written, read = 0):
+        # seconds for a register transfer writing written bytes and reading read bytes
+        return self.syscall + self.bits(written, read) / float(self.scl)
+
+    def nack(self):
+        # address byte that nobody acknowledged
+        return self.syscall + (2 + self.bitsPerByte) / float(self.scl)
+
+class SimBus(I2CBus):
+    # Pure python stand-in for smbus.SMBus, transfers to an address without a
+    # device fail with IOError just like a NACK on real hardware. The time
+    # the traffic would have taken on a real bus is summed up in busTime,
+    # see WireTiming.
+
+    def __init__(self, blockMax = 32, timing = None):
+        self.blockMax = blockMax
+        self.devices = {}
+        if timing is None:
+            timing = WireTiming()
+        self.timing = timing
+
+        # traffic counters
+        self.transactions = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.busTime = 0.0
+
+    def addDevice(self, address, device = None):
+        if device is None:
+            device = SimDevice()
+        self.devices[address] = device
+        return device
+
+    def removeDevice(self, address):
+        self.devices.pop(address, None)
+
+    def getDevice(self, address):
+        self.transactions += 1
+        try:
+            return self.devices[address]
+        except KeyError:
+            self.busTime += self.timing.nack()
+            raise IOError(errno.EREMOTEIO, 'No device at address 0x%02X' % address)
+
+    def checkLength(self, length):
+        if length > self.blockMax:
+            raise ValueError('Block transfer of %d bytes exceeds %d' % (length, self.blockMax))
+
+    def resetCounters(self):
+        self.transactions = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.busTime = 0.0
+
+    def report(self):
+        # traffic counters and the estimated wall time on a real bus
+        return {
+            'transactions' : self.transactions,
+            'bytesRead' : self.bytesRead,
+            'bytesWritten' : self.bytesWritten,
+            'scl' : self.timing.scl,
+            'busTime' : self.busTime}
+
+    def read_byte_data(self, address, reg):
+        device = self.getDevice(address)
+        self.bytesRead += 1
+        self.busTime += self.timing.transfer(0, 1)
+        return device.read(reg)
+
+    def write_byte_data(self, address, reg, value):
+        device = self.getDevice(address)
+        self.bytesWritten += 1
+        self.busTime += self.timing.transfer(1)
+        device.write(reg, value)
+
+    def read_i2c_block_data(self, address, reg, length = 32):
+        self.checkLength(length)
+        device = self.getDevice(address)
+        self.bytesRead += length
+        self.busTime += self.timing.transfer(0, length)
+        return device.readBlock(reg, length)
+
+    def write_i2c_block_data(self, address, reg, data):
+        self.checkLength(len(data))
+        device = self.getDevice(address)
+        self.bytesWritten += len(data)
+        self.busTime += self.timing.transfer(len(data))
+        device.writeBlock(reg, data)
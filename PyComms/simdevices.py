@@ -0,0 +1,162 @@
+#!/usr/bin/python
+
+# Python Standard Library Imports
+import collections
+
+# External Imports
+pass
+
+# Custom Imports
+from simbus import SimDevice
+
+# ===========================================================================
+# Simulated chips for SimBus, just enough behaviour for the drivers to run
+# ===========================================================================
+
+class MPU6050Sim(SimDevice):
+    # Memory banks behind BANK_SEL / MEM_START_ADDR / MEM_R_W, a FIFO that
+    # the "DMP" keeps refilling with packets while it is enabled, and the
+    # self-clearing reset bits.
+
+    BANK_SEL       = 0x6D
+    MEM_START_ADDR = 0x6E
+    MEM_R_W        = 0x6F
+    FIFO_COUNTH    = 0x72
+    FIFO_COUNTL    = 0x73
+    FIFO_R_W       = 0x74
+    USER_CTRL      = 0x6A
+    PWR_MGMT_1     = 0x6B
+    WHO_AM_I       = 0x75
+    INT_STATUS     = 0x3A
+
+    def __init__(self, packet = None, packetSize = 42):
+        SimDevice.__init__(self, {self.WHO_AM_I : 0x68, self.PWR_MGMT_1 : 0x40})
+        self.fixedRegisters = set([self.MEM_R_W, self.FIFO_R_W])
+        self.memory = [bytearray(256) for bank in range(32)]
+        self.bank = 0
+        self.memAddress = 0
+        self.fifo = collections.deque()
+        # packet the DMP produces, a level quaternion by default
+        if packet is None:
+            packet = [0x40, 0, 0, 0] + [0] * (packetSize - 4)
+        self.packet = list(packet)
+
+        self.onWrite(self.BANK_SEL, self.writeBankSel)
+        self.onWrite(self.MEM_START_ADDR, self.writeMemStartAddr)
+        self.onWrite(self.MEM_R_W, self.writeMem)
+        self.onRead(self.MEM_R_W, self.readMem)
+        self.onWrite(self.USER_CTRL, self.writeUserCtrl)
+        self.onWrite(self.PWR_MGMT_1, self.writePwrMgmt1)
+        self.onRead(self.FIFO_COUNTH, self.readFIFOCountH)
+        self.onRead(self.FIFO_COUNTL, self.readFIFOCountL)
+        self.onRead(self.FIFO_R_W, self.readFIFO)
+        self.onRead(self.INT_STATUS, self.readIntStatus)
+
+    def writeBankSel(self, device, reg, value):
+        self.bank = value & 0x1F
+
+    def writeMemStartAddr(self, device, reg, value):
+        self.memAddress = value
+
+    def writeMem(self, device, reg, value):
+        self.memory[self.bank][self.memAddress] = value
+        self.memAddress = (self.memAddress + 1) & 0xFF
+
+    def readMem(self, device, reg):
+        value = self.memory[self.bank][self.memAddress]
+        self.memAddress = (self.memAddress + 1) & 0xFF
+        return value
+
+    def writeUserCtrl(self, device, reg, value):
+        if value & 0x04:
+            self.fifo.clear()
+        # the reset bits clear themselves
+        self.registers[reg] = value & ~0x0F
+
+    def writePwrMgmt1(self, device, reg, value):
+        if value & 0x80:
+            self.fifo.clear()
+            self.registers[reg] = 0x40
+
+    def dmpRunning(self):
+        return self.registers[self.USER_CTRL] & 0x80
+
+    def produce(self):
+        # one more packet from the DMP, whenever the FIFO got drained
+        if not self.fifo and self.dmpRunning():
+            self.fifo.extend(self.packet)
+
+    def readFIFOCountH(self, device, reg):
+        self.produce()
+        return len(self.fifo) >> 8
+
+    def readFIFOCountL(self, device, reg):
+        return len(self.fifo) & 0xFF
+
+    def readFIFO(self, device, reg):
+        if self.fifo:
+            return self.fifo.popleft()
+        return 0
+
+    def readIntStatus(self, device, reg):
+        # DMP interrupt set while there is a packet waiting
+        self.produce()
+        if self.fifo:
+            return 0x02
+        return 0
+
+class BMP085Sim(SimDevice):
+    # Calibration PROM and conversions of the BMP085, loaded with the worked
+    # example of the datasheet (15.0 C, 69964 Pa in ultra low power mode)
+
+    CALIBRATION = [408, -72, -14383, 32741, 32757, 23153, 6190, 4, -32768, -8711, 2868]
+    CONTROL = 0xF4
+    DATA = 0xF6
+
+    def __init__(self, UT = 27898, UP = 23843):
+        SimDevice.__init__(self, {0xD0 : 0x55})
+        self.UT = UT
+        self.UP = UP
+        reg = 0xAA
+        for value in self.CALIBRATION:
+            value &= 0xFFFF
+            self.registers[reg] = value >> 8
+            self.registers[reg + 1] = value & 0xFF
+            reg += 2
+        self.onWrite(self.CONTROL, self.writeControl)
+
+    def writeControl(self, device, reg, value):
+        if value == 0x2E:
+            self.registers[self.DATA] = self.UT >> 8
+            self.registers[self.DATA + 1] = self.UT & 0xFF
+        elif value & 0x3F == 0x34:
+            oss = value >> 6
+            raw = self.UP << (8 - oss)
+            self.registers[self.DATA] = (raw >> 16) & 0xFF
+            self.registers[self.DATA + 1] = (raw >> 8) & 0xFF
+            self.registers[self.DATA + 2] = raw & 0xFF
+
+class HMC5883LSim(SimDevice):
+    # Identification registers and a fixed field reading
+
+    def __init__(self, x = 200, y = -150, z = -420):
+        SimDevice.__init__(self, {0x00 : 0x10, 0x01 : 0x20, 0x02 : 0x01, 0x09 : 0x01,
+            0x0A : ord('H'), 0x0B : ord('4'), 0x0C : ord('3')})
+        reg = 0x03
+        for value in (x, z, y):
+            value &= 0xFFFF
+            self.registers[reg] = value >> 8
+            self.registers[reg + 1] = value & 0xFF
+            reg += 2
+
+class PCA9685Sim(SimDevice):
+    # Plain register file with the power-on MODE1 value, restart clears itself
+
+    MODE1 = 0x00
+
+    def __init__(self):
+        SimDevice.__init__(self, {self.MODE1 : 0x11, 0x02 : 0xE2, 0x03 : 0xE4, 0x04 : 0xE8, 0x05 : 0xE0, 0xFE : 0x1E})
+        self.onWrite(self.MODE1, self.writeMode1)
+
+    def writeMode1(self, device, reg, value):
+        self.registers[reg] = value & 0x7F